@@ -8,25 +8,139 @@ from models.chat import Chat, Message
 from models.context import Context
 from models.user import User
 from core.database import db
-from redisDB.database import redis_cache as cache   
+from redisDB.database import redis_cache as cache, answer_cache
 from core.middleware import get_current_user
 import base64
 from PIL import Image
-from core.model import analyze
+from core.model import analyze, known_hash
+from core.model_manager import model_manager
+from core.model_client import model_client
+from core.inference import inference_executor
+from core.kv_cache import prefix_cache
+from core.streaming import AsyncTextStreamer, iterate_streamer
+from core.cancellation import CancellationToken
+from core.vision_cache import sha256_bytes, sha256_file
+from core.storage import storage
+from core.uploads import parse_chat_upload, check_upload_size
+from core.media_store import media_store, image_extension
+from core.ingest import image_ingest
+from core.frame_cache import frame_cache
+from core.long_video import long_video_duration, analyze_long_video
+from core.pdf_extract import parse_page_range, check_page_range, pdf_extractor
+from core.metrics import BACKGROUND_WRITE_FAILURES
+from core.log import get_logger
+import asyncio
+import functools
 import json
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, StreamingResponse
 from fastapi import File, UploadFile
 import sys
 from typing import Optional
 from pathlib import Path
 # Add the project's top-level directory to sys.path
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "../../..")))
-from config_model import BASE_DIR, MODE
+from config_model import (
+    BASE_DIR, MODE, REQUEST_DEADLINE_SECONDS, DISCONNECT_POLL_SECONDS, ANSWER_CACHE_ENABLED, INGEST_ENABLED,
+    LONG_VIDEO_DEADLINE_SECONDS
+)
 
 # from core.model import model
 router = APIRouter()
+log = get_logger("chat")
 mode = MODE
 
+
+# Folder of each analyze() media argument for names saved before the media store
+MEDIA_FOLDERS = {"image_files": "images", "video_files": "videos", "pdf_files": "pdfs"}
+
+
+async def generate_response(request: Request, use_cache: bool = True, **kwargs):
+    """
+    Run analyze() on the inference executor so generation stays off the event loop.
+    Generation stops between decoding steps when the client disconnects or the request deadline passes.
+    Answers already given for the same question and files come from the answer cache.
+    """
+    model_manager.ensure_ready()
+    cache_key = await answer_cache_key(kwargs, use_cache)
+    if cache_key:
+        cached = await answer_cache.get(cache_key)
+        if cached is not None:
+            return cached
+    duration = await asyncio.to_thread(long_video_duration, kwargs)
+    cancel_token = CancellationToken(LONG_VIDEO_DEADLINE_SECONDS if duration else REQUEST_DEADLINE_SECONDS)
+    watcher = asyncio.create_task(watch_disconnect(request, cancel_token))
+    try:
+        if duration:
+            # Long recordings are answered segment by segment, then merged
+            ai_response = await analyze_long_video(inference_fn(), duration, cancel_token, **kwargs)
+        else:
+            ai_response = await inference_executor.submit(inference_fn(), cancel_token=cancel_token, **kwargs)
+    finally:
+        watcher.cancel()
+    if cache_key and ai_response and cancel_token.reason is None:
+        await answer_cache.set(cache_key, ai_response)
+    return mark_partial(ai_response, cancel_token)
+
+
+def media_hashes(kwargs: dict) -> dict:
+    """SHA-256 of every attached upload or file, so identical uploads share cached answers."""
+    hashes = {}
+    for key, folder in MEDIA_FOLDERS.items():
+        files = kwargs.get(key) or []
+        if isinstance(files, (str, Path)):
+            files = [files]
+        # Uploads carry the hash computed when they were stored; only files without one are read
+        hashes[key] = [
+            known_hash(kwargs.get("content_hashes"), key, index)
+            or (sha256_bytes(bytes(item)) if isinstance(item, (bytes, bytearray, memoryview))
+                else media_store.content_hash(item) or sha256_file(media_store.resolve(folder, item)))
+            for index, item in enumerate(files)
+        ]
+    if kwargs.get("pdf_pages"):
+        # Different pages of the same PDF get different answers
+        hashes["pdf_pages"] = list(kwargs["pdf_pages"])
+    return hashes
+
+
+def wants_cache(value) -> bool:
+    """Requests opt out of the answer cache with "cache": false (JSON) or cache=false (form field)."""
+    return value is not False and str(value).lower() != "false"
+
+
+async def answer_cache_key(kwargs: dict, use_cache: bool = True):
+    """Answer cache key for this analyze() call, or None when the request opted out."""
+    if not ANSWER_CACHE_ENABLED or not use_cache:
+        return None
+    try:
+        hashes = await asyncio.to_thread(media_hashes, kwargs)
+    except OSError:
+        # analyze() reports missing files itself
+        return None
+    return answer_cache.make_key(kwargs.get("query"), hashes, kwargs.get("history"), kwargs.get("summary"))
+
+
+async def watch_disconnect(request: Request, cancel_token: CancellationToken):
+    """Cancel generation as soon as the client goes away."""
+    while not cancel_token.cancelled:
+        if await request.is_disconnected():
+            cancel_token.cancel("disconnected")
+            return
+        await asyncio.sleep(DISCONNECT_POLL_SECONDS)
+
+
+def mark_partial(ai_response, cancel_token: CancellationToken):
+    """Label answers that were cut short so the stored history shows they are incomplete."""
+    if cancel_token.reason == "deadline":
+        return f"{ai_response or ''}\n\n[Response cut short: time limit reached]"
+    if cancel_token.reason == "disconnected":
+        return f"{ai_response or ''}\n\n[Response stopped: client disconnected]"
+    return ai_response
+
+
+def inference_fn():
+    """analyze() in this process, or its proxy to the shared model server."""
+    return model_client.analyze if model_manager.remote else analyze
+
 # GET /context - Get all context titles and IDs for the authenticated user
 @router.delete("/context/{context_id}")
 async def delete_context(context_id: str, user: User = Depends(get_current_user)):
@@ -35,10 +149,26 @@ async def delete_context(context_id: str, user: User = Depends(get_current_user)
     if not context:
         raise HTTPException(status_code=404, detail="Context not found for this user")
     
+    # Videos of the context, whose cached frames go with it unless another chat still references them
+    chats = await db.chats_collection.find({"context_id": ObjectId(context_id), "user_id": user["_id"]}).to_list(length=None)
+    videos = {name for chat in chats for entry in chat.get("chats", []) for name in entry.get("videos") or []}
+
     # Delete the context and associated chats
     await context_collection.delete_one({"_id": ObjectId(context_id), "user_id": user["_id"]})
     await db.chats_collection.delete_many({"context_id": ObjectId(context_id), "user_id": user["_id"]})
     await cache.delete(context_id, user["_id"])
+    if model_manager.remote:
+        try:
+            await asyncio.to_thread(model_client.drop_context, context_id)
+        except (HTTPException, OSError) as e:
+            # The entry still ages out of the server's prefix cache; the context is gone either way
+            log.warning("prefix_drop_failed", context_id=context_id, error=str(getattr(e, "detail", e)))
+    else:
+        prefix_cache.drop(context_id)
+    for name in videos:
+        video_hash = media_store.content_hash(name)
+        if video_hash and not await db.chats_collection.find_one({"chats.videos": name}, {"_id": 1}):
+            await storage.run("frame_cache_drop", frame_cache.drop, video_hash)
     remContext = context_collection.find({"user_id": ObjectId(user["_id"])})
     contexts = await remContext.to_list(length=100)
     #Array with only the context titles and id
@@ -69,11 +199,33 @@ async def create_context(
     images = req["images"]
     videos = req["videos"]
     pdfs = req["pdfs"]
-    context_collection = db.contexts_collection
     # Handle case where neither message nor images are provided
     if not message and not images and not videos and not pdfs:
         raise HTTPException(status_code=400, detail="Either message or images must be provided")
-    
+    saved = await save_chat_media(req)
+    return await open_context(chat_request, user, message, saved, use_cache=wants_cache(req.get("cache", True)))
+
+
+# Multipart variant of create_context: files are streamed to disk as they arrive instead of base64 in JSON
+@router.post("/context/multipart")
+async def create_context_multipart(chat_request: Request, user: User = Depends(get_current_user)):
+    fields, parts = await parse_chat_upload(chat_request, video_dir=media_store.tmp_dir)
+    message = fields.get("message", "")
+    try:
+        if not message and not any(parts.values()):
+            raise HTTPException(status_code=400, detail="Either message or images must be provided")
+        saved = await store_uploaded_media(parts, fields.get("pdf_pages"))
+        return await open_context(chat_request, user, message, saved, use_cache=wants_cache(fields.get("cache", True)))
+    finally:
+        discard_parts(parts)
+
+
+async def open_context(chat_request: Request, user: User, message: str, saved, use_cache: bool = True):
+    """
+    Create a context for the first message of a chat and answer it.
+    saved is what save_chat_media/store_uploaded_media returned for the message's uploads.
+    """
+    context_collection = db.contexts_collection
     # Create context title based on message or default
     title = (message[:10] + "...") if message else "Untitled Context"
     
@@ -82,101 +234,51 @@ async def create_context(
         "title": title,
         "created_at": datetime.now(timezone.utc)
     }
+    if mode == "model":
+        # Fail with 503 before creating a context that would never get its first answer
+        model_manager.ensure_ready()
     result = await context_collection.insert_one(new_context)
     new_context["_id"] = result.inserted_id
     context_id = result.inserted_id
-    # Process images if provided
-    video_filenames = []
-    image_filenames = []
-    pdf_filenames = []
-    # Define image_paths and video_paths lists before the loops
-    image_paths = []
-    video_paths = []
-    pdf_paths = []
-    # Process images if provided
-    for image in images:
-        try:
-            # Create images directory if it doesn't exist
-            # Generate unique filename for each image
-            image_data = base64.b64decode(image)
-            img = Image.open(BytesIO(image_data))
-            image_filename = f"{context_id}_{datetime.now().timestamp()}.png"
-            image_path = Path("images") / image_filename
-            # os.makedirs(os.path.dirname(image_path), exist_ok=True)
-            img.save(image_path, "PNG")
-            
-            # Append the path to the image_paths list
-            image_paths.append(image_path)  # Store the full path
-            
-            # Store relative path for analyze function
-            image_filenames.append(image_filename)
-        except Exception as e:
-            raise HTTPException(status_code=400, detail=f"Error processing image: {str(e)}")
-
-    # Process videos if provided
-    for video in videos:
-        try:
-            # Create videos directory if it doesn't exist            
-            # Generate unique filename for each video
-            video_data = base64.b64decode(video)
-            video_filename = f"{context_id}_{datetime.now().timestamp()}.mp4"
-            video_path = os.path.join("videos", video_filename)
-                
-            with open(video_path, "wb") as f:
-                f.write(video_data)
-            video_filenames.append(video_filename)
-            video_paths.append(video_path) 
-            
-        except Exception as e:
-            raise HTTPException(status_code=400, detail=f"Error processing video: {str(e)}")
-    for pdf in pdfs:
-        try:
-            # Create videos directory if it doesn't exist
-            os.makedirs("pdfs", exist_ok=True)
-            
-            # Generate unique filename for each video
-            pdf_data = base64.b64decode(pdf)
-            pdf_filename = f"{context_id}_{datetime.now().timestamp()}.pdf"
-            pdf_path = Path("pdfs") / pdf_filename
-                
-            with open(pdf_path, "wb") as f:
-                f.write(pdf_data)
-            pdf_filenames.append(pdf_filename)
-            
-            pdf_paths.append(pdf_path)  # Store the full path
-            
-        except Exception as e:
-            raise HTTPException(status_code=400, detail=f"Error processing pdf: {str(e)}")
+    # Decoded media goes straight to the model; the files are written in the background
+    image_filenames, video_filenames, pdf_filenames, media = saved
+    image_data = media["image_files"]
+    video_data = media["video_files"]
+    pdf_data = media["pdf_files"]
     # Use analyze function to get bot's response
     
     if mode == "model":
         try:
-            if image_paths and video_paths and message:
+            if image_data and video_data and message:
                 # All inputs: images, videos, and text query
-                ai_response = analyze(query=message, image_files=image_filenames, video_files=video_paths)
-            elif image_paths and message:
+                ai_response = await generate_response(chat_request, use_cache=use_cache, query=message, image_files=image_data, video_files=video_data, content_hashes=media["content_hashes"])
+            elif image_data and message:
                 # Images and text query only
-                ai_response = analyze(query=message, image_files=image_filenames)
-            elif video_paths and message:
+                ai_response = await generate_response(chat_request, use_cache=use_cache, query=message, image_files=image_data, content_hashes=media["content_hashes"])
+            elif video_data and message:
                 # Videos and text query only
-                ai_response = analyze(query=message, video_files=video_filenames)
-            elif image_paths and video_paths:
+                ai_response = await generate_response(chat_request, use_cache=use_cache, query=message, video_files=video_data, content_hashes=media["content_hashes"])
+            elif image_data and video_data:
                 # Images and videos only
-                ai_response = analyze(query=None, image_files=image_filenames, video_files=video_filenames)
-            elif image_paths:
+                ai_response = await generate_response(chat_request, use_cache=use_cache, query=None, image_files=image_data, video_files=video_data, content_hashes=media["content_hashes"])
+            elif image_data:
                 # Images only
-                ai_response = analyze(query=None, image_files=image_filenames)
-            elif video_paths:
+                ai_response = await generate_response(chat_request, use_cache=use_cache, query=None, image_files=image_data, content_hashes=media["content_hashes"])
+            elif video_data:
                 # Videos only
-                ai_response = analyze(query=None, video_files=video_filenames)
-            elif pdf_paths: 
-                ai_response = analyze(query=None, pdf_files=pdf_filenames)
+                ai_response = await generate_response(chat_request, use_cache=use_cache, query=None, video_files=video_data, content_hashes=media["content_hashes"])
+            elif pdf_data: 
+                ai_response = await generate_response(chat_request, use_cache=use_cache, query=None, pdf_files=pdf_data, pdf_pages=media["pdf_pages"], content_hashes=media["content_hashes"])
             elif message:
                 # Text query only
-                ai_response = analyze(query=message)
+                ai_response = await generate_response(chat_request, use_cache=use_cache, query=message, context_id=str(context_id))
             else:
                 # No valid input
                 ai_response = "No input provided to generate a response."
+        except HTTPException:
+            # A full queue (503) or a timeout (504) leaves no chat to show, so drop the context again
+            await context_collection.delete_one({"_id": context_id})
+            raise
         except Exception as e:
             ai_response = f"An error occurred while generating the response: {str(e)}"
 
@@ -227,6 +329,134 @@ async def get_chats_by_context(context_id: str, user: User = Depends(get_current
     return chat_document
 
 
+# Media kind, analyze() argument, default file extension and the name used in error messages
+MEDIA_KINDS = (
+    ("images", "image_files", "png", "image"),
+    ("videos", "video_files", "mp4", "video"),
+    ("pdfs", "pdf_files", "pdf", "pdf"),
+)
+
+# Media files still being written in the background; holding the tasks keeps them from being garbage collected
+pending_writes = set()
+
+
+def media_name(kind: str, data: bytes, label: str, extension: str, sha256: str = None) -> str:
+    """Content-addressed name of an upload; images are checked and keep the format they came in."""
+    if kind == "images":
+        try:
+            # Reads only the header, so a broken upload is rejected before inference
+            extension = image_extension(data)
+        except Exception as e:
+            raise HTTPException(status_code=400, detail=f"Error processing {label}: {str(e)}")
+    if sha256:
+        return f"{sha256}.{extension}"
+    return media_store.name_for(data, extension)
+
+
+def finish_write(op: str, fields: dict, task):
+    pending_writes.discard(task)
+    if not task.cancelled() and task.exception():
+        BACKGROUND_WRITE_FAILURES.labels(op=op).inc()
+        log.error("background_write_failed", op=op, error=str(task.exception()), **fields)
+
+
+def in_background(work, op: str, **fields):
+    """Run a write without holding up the response; op and fields identify it if it fails."""
+    task = asyncio.create_task(work)
+    pending_writes.add(task)
+    task.add_done_callback(functools.partial(finish_write, op, fields))
+
+
+def persist_in_background(kind: str, name: str, data: bytes):
+    """
+    Write a new upload to the media store off the request path; a duplicate is just a lookup.
+    Images also get their thumbnail and model-ready array, which later turns load instead of the original.
+    """
+    if not media_store.exists(name):
+        in_background(storage.write("disk_write", media_store.put, name, data), "media_put", media=name)
+    image_hash = media_store.content_hash(name)
+    if kind == "images" and INGEST_ENABLED and not image_ingest.ingested(image_hash):
+        in_background(storage.write("image_ingest", image_ingest.ingest, image_hash, data), "image_ingest", media=name)
+
+
+async def save_chat_media(chat_document: dict):
+    """
+    Decode the base64 media of a chat message and return the content-addressed names stored with
+    the chat, plus the decoded bytes keyed by analyze() argument. The bytes are what inference uses;
+    new files are written to the media store in the background.
+    """
+    filenames = {"images": [], "videos": [], "pdfs": []}
+    media = {"image_files": [], "video_files": [], "pdf_files": [], "pdf_pages": page_range(chat_document.get("pdf_pages")), "content_hashes": {}}
+    for kind, key, extension, label in MEDIA_KINDS:
+        for encoded in chat_document.get(kind) or []:
+            try:
+                data = await storage.b64decode(encoded)
+            except Exception as e:
+                raise HTTPException(status_code=400, detail=f"Error processing {label}: {str(e)}")
+            check_upload_size(kind, len(data))
+            name = await storage.run("media_inspect", media_name, kind, data, label, extension)
+            persist_in_background(kind, name, data)
+            filenames[kind].append(name)
+            media[key].append(data)
+            media["content_hashes"].setdefault(key, []).append(media_store.content_hash(name))
+    await check_pdf_pages(media, filenames["pdfs"])
+    return filenames["images"], filenames["videos"], filenames["pdfs"], media
+
+
+async def store_uploaded_media(parts: dict, pdf_pages=None):
+    """
+    Counterpart of save_chat_media for multipart uploads, whose hashes were computed while they
+    arrived. Videos were streamed to disk and are moved into the store, then passed to analyze()
+    by name; images and PDFs are handed over in memory and written in the background.
+    """
+    filenames = {"images": [], "videos": [], "pdfs": []}
+    media = {"image_files": [], "video_files": [], "pdf_files": [], "pdf_pages": page_range(pdf_pages), "content_hashes": {}}
+    for kind, key, extension, label in MEDIA_KINDS:
+        for part in parts[kind]:
+            if part.path:
+                name = f"{part.sha256}.{part.extension or extension}"
+                await storage.write("media_adopt", media_store.adopt, part.path, name)
+                media[key].append(name)
+            else:
+                data = await storage.run("upload_read", part.read)
+                name = await storage.run("media_inspect", media_name, kind, data, label, extension, part.sha256)
+                persist_in_background(kind, name, data)
+                media[key].append(data)
+            filenames[kind].append(name)
+            media["content_hashes"].setdefault(key, []).append(media_store.content_hash(name))
+    await check_pdf_pages(media, filenames["pdfs"])
+    return filenames["images"], filenames["videos"], filenames["pdfs"], media
+
+
+def page_range(value):
+    """Optional "pdf_pages" of a message, e.g. "3-10", as analyze()'s pdf_pages."""
+    try:
+        return parse_page_range(value)
+    except (TypeError, ValueError):
+        raise HTTPException(status_code=400, detail="pdf_pages must look like 3-10")
+
+
+async def check_pdf_pages(media: dict, names: list):
+    """Reject a pdf_pages range that starts past the end of one of the message's PDFs."""
+    if not media["pdf_pages"]:
+        return
+    for pdf, name in zip(media["pdf_files"], names):
+        if isinstance(pdf, str):
+            pdf = media_store.resolve("pdfs", pdf)
+        total = await storage.run("pdf_page_count", pdf_extractor.page_count, pdf, media_store.content_hash(name))
+        try:
+            check_page_range(media["pdf_pages"], total)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=f"pdf_pages: {e}")
+
+
+def discard_parts(parts: dict):
+    """Remove temp files of a multipart upload that were not moved into place."""
+    for files in parts.values():
+        for part in files:
+            part.discard()
+
+
 # Backend endpoint modification
 @router.post("/{context_id}")
 async def post_chat_to_context(context_id: str, chat_request: Request, user: User = Depends(get_current_user)):
@@ -235,108 +465,80 @@ async def post_chat_to_context(context_id: str, chat_request: Request, user: Use
         raise HTTPException(status_code=400, detail="Either message or images must be provided")
     # Handle multiple images if provided
     context = await cache.get(context_id, user["_id"])
-    image_paths = []
-    video_paths = []
-    pdf_paths = []
-    if chat_document.get("images"):
-        os.makedirs("images", exist_ok=True)
-        for encoded_image in chat_document["images"]:
-            try:
-                # Decode and save each image
-                image_data = base64.b64decode(encoded_image)
-                image = Image.open(BytesIO(image_data))
-                image_filename = f"{context_id}_{datetime.now().timestamp()}_{len(image_paths)}.png"
-                image_path = Path("images") / image_filename
-                image.save(image_path, "PNG")
-                image_paths.append(image_path)
-                print(image_path)
-            except Exception as e:
-                raise HTTPException(status_code=400, detail=f"Error processing image: {str(e)}")
-            
-    if chat_document.get("videos"):
-        os.makedirs("videos", exist_ok=True)
-        for encoded_video in chat_document["videos"]:
-            try:
-                # Decode and save each video
-                video_data = base64.b64decode(encoded_video)
-                video_filename = f"{context_id}_{datetime.now().timestamp()}_{len(video_paths)}.mp4"
-                video_path = os.path.join("videos", video_filename)
-                with open(video_path, "wb") as f:
-                    f.write(video_data)
-                # Store full path for analyze function
-                video_paths.append(video_path)
-            except Exception as e:
-                raise HTTPException(status_code=400, detail=f"Error processing video: {str(e)}")
-    if chat_document.get("pdfs"):
-        os.makedirs("pdfs", exist_ok=True)
-        for encoded_pdf in chat_document["pdfs"]:
-            try:
-                # Decode and save each pdf
-                pdf_data = base64.b64decode(encoded_pdf)
-                pdf_filename = f"{context_id}_{datetime.now().timestamp()}_{len(pdf_paths)}.pdf"
-                pdf_path = Path("pdfs") / pdf_filename
-                with open(pdf_path, "wb") as f:
-                    f.write(pdf_data)
-                # Store full path for analyze function
-                pdf_paths.append(pdf_path)
-            except Exception as e:
-                raise HTTPException(status_code=400, detail=f"Error processing pdf: {str(e)}")
+    if not context:
+        raise HTTPException(status_code=404, detail="Chat context not found for this user")
+    saved = await save_chat_media(chat_document)
+    return await answer_in_context(
+        chat_request,
+        user,
+        context_id,
+        context,
+        chat_document["message"],
+        saved,
+        use_cache=wants_cache(chat_document.get("cache", True))
+    )
+
+
+# Multipart variant of post_chat_to_context: files are streamed to disk as they arrive instead of base64 in JSON
+@router.post("/{context_id}/multipart")
+async def post_chat_to_context_multipart(context_id: str, chat_request: Request, user: User = Depends(get_current_user)):
+    context = await cache.get(context_id, user["_id"])
+    if not context:
+        raise HTTPException(status_code=404, detail="Chat context not found for this user")
+    fields, parts = await parse_chat_upload(chat_request, video_dir=media_store.tmp_dir)
+    message = fields.get("message", "")
+    try:
+        if not message and not any(parts.values()):
+            raise HTTPException(status_code=400, detail="Either message or images must be provided")
+        saved = await store_uploaded_media(parts, fields.get("pdf_pages"))
+        return await answer_in_context(
+            chat_request,
+            user,
+            context_id,
+            context,
+            message,
+            saved,
+            use_cache=wants_cache(fields.get("cache", True))
+        )
+    finally:
+        discard_parts(parts)
+
+
+async def answer_in_context(chat_request: Request, user: User, context_id: str, context: dict, message: str, saved, use_cache: bool = True):
+    """Answer a message in an existing context and append both to its history."""
+    image_files, video_files, pdf_files, media = saved
     # Create a user message log with relative paths for storage
-    relative_paths = [os.path.basename(path) for path in image_paths]
-    relative_paths_videos = [os.path.basename(path) for path in video_paths]
-    reltaive_paths_pdfs = [os.path.basename(path) for path in pdf_paths]
     new_message = [{
         "sender": "user",
-        "message": chat_document["message"],
-        "images": relative_paths,  # Store relative paths for DB,
-        "videos": relative_paths_videos,
-        "pdfs": reltaive_paths_pdfs,
+        "message": message,
+        "images": image_files,  # Store relative paths for DB,
+        "videos": video_files,
+        "pdfs": pdf_files,
         "timestamp": datetime.now(timezone.utc)
     }]
 
-    
-    # print("video path: ", relative_paths_videos)
-  
-    # Pass the query and full image paths to the analyze function
-    # if mode == "model":
-    #     try:
-    #         if image_paths:
-    #             ai_response = analyze(query=chat_document["message"], image_files=image_paths[0])
-    #         else:
-    #             ai_response = analyze(query=chat_document["message"])
-            
-    #     except Exception as e:
-    #         ai_response = f"An error occurred while generating the response: {str(e)}"
-    # elif mode == "notmodel":
-    #     ai_response = "This is chat message after first response without model"
-    # else:
-    #     ai_response = "Invalid mode provided. Please use 'model' or 'notmodel'"
-
+    summary = context.get("summary") or {}
     context = context['chats']
     if mode == "model":
         try:
-            if image_paths and video_paths and chat_document["message"]:
-                # All inputs: images, videos, and text query
-                ai_response = analyze(query=chat_document["message"], history=context, image_files=image_filename, video_files=video_filename)
-            elif image_paths and chat_document["message"]:
-                # Images and text query only
-                ai_response = analyze(query=chat_document["message"],history=context, image_files=image_filename)
-            elif video_paths and chat_document["message"]:
-                # Videos and text query only
-                ai_response = analyze(query=chat_document["message"],history=context, video_files=video_filename)
-            elif image_paths:
-                # Images only
-                ai_response = analyze(query=None,history=context, image_files=image_filename)
-            elif pdf_paths:
-                ai_response = analyze(query=None,history=context, pdf_files=pdf_filename)
-            elif video_paths:
-                # Videos only
-                ai_response = analyze(query=None,history=context, video_files=video_filename)
-            elif chat_document["message"]:
-                # Text query only
-                ai_response = analyze(query=chat_document["message"], history=context)
+            if image_files or video_files or pdf_files or message:
+                ai_response = await generate_response(
+                    chat_request,
+                    use_cache=use_cache,
+                    query=message or None,
+                    history=context,
+                    image_files=media["image_files"] or None,
+                    video_files=media["video_files"] or None,
+                    pdf_files=media["pdf_files"] or None,
+                    pdf_pages=media["pdf_pages"],
+                    content_hashes=media["content_hashes"],
+                    context_id=context_id,
+                    summary=summary
+                )
             else:
                 ai_response = "No input provided to generate a response."
+        except HTTPException:
+            raise
         except Exception as e:
             ai_response = f"An error occurred while generating the response: {str(e)}"
     elif mode == "notmodel":
@@ -352,10 +554,115 @@ async def post_chat_to_context(context_id: str, chat_request: Request, user: Use
     })
 
     # Update the chat context in Redis cache
-    await cache.update(context_id, user["_id"], new_message)
+    await cache.update(context_id, user["_id"], new_message, summary=summary)
     return new_message
 
 
+def sse_event(data, event: str = None) -> str:
+    """Format one Server-Sent Events frame."""
+    frame = f"event: {event}\n" if event else ""
+    return frame + f"data: {json.dumps(data, default=str)}\n\n"
+
+
+# Streaming variant of post_chat_to_context: tokens are sent as Server-Sent Events as they are generated
+@router.post("/{context_id}/stream")
+async def stream_chat_to_context(context_id: str, chat_request: Request, user: User = Depends(get_current_user)):
+    chat_document = await chat_request.json()
+    if not chat_document.get("message") and not chat_document.get("images") and not chat_document.get("videos") and not chat_document.get("pdfs"):
+        raise HTTPException(status_code=400, detail="Either message or images must be provided")
+    context = await cache.get(context_id, user["_id"])
+    if not context:
+        raise HTTPException(status_code=404, detail="Chat context not found for this user")
+    image_files, video_files, pdf_files, media = await save_chat_media(chat_document)
+    new_message = [{
+        "sender": "user",
+        "message": chat_document["message"],
+        "images": image_files,
+        "videos": video_files,
+        "pdfs": pdf_files,
+        "timestamp": datetime.now(timezone.utc)
+    }]
+
+    summary = context.get("summary") or {}
+    streamer = None
+    job = None
+    cached = None
+    cache_key = None
+    cancel_token = CancellationToken(REQUEST_DEADLINE_SECONDS)
+    if mode == "model":
+        model_manager.ensure_ready()
+        kwargs = dict(
+            query=chat_document["message"] or None,
+            history=context["chats"],
+            image_files=media["image_files"] or None,
+            video_files=media["video_files"] or None,
+            pdf_files=media["pdf_files"] or None,
+            pdf_pages=media["pdf_pages"],
+            content_hashes=media["content_hashes"],
+            context_id=context_id,
+            summary=summary
+        )
+        cache_key = await answer_cache_key(kwargs, wants_cache(chat_document.get("cache", True)))
+        if cache_key:
+            cached = await answer_cache.get(cache_key)
+        if cached is None:
+            streamer = AsyncTextStreamer(model_manager.tokenizer, asyncio.get_running_loop())
+            # Enqueue before responding so a full queue still fails fast with 503
+            job = inference_executor.enqueue(inference_fn(), streamer=streamer, cancel_token=cancel_token, **kwargs)
+
+    async def event_stream():
+        if mode == "model" and cached is not None:
+            ai_response = cached
+            yield sse_event({"token": ai_response})
+        elif mode == "model":
+            parts = []
+            try:
+                async for text in iterate_streamer(streamer, job, inference_executor.timeout):
+                    parts.append(text)
+                    yield sse_event({"token": text})
+                ai_response = await job
+                if cache_key and ai_response and cancel_token.reason is None:
+                    await answer_cache.set(cache_key, ai_response)
+                if ai_response is None:
+                    ai_response = "".join(parts) or "An error occurred while generating the response."
+                ai_response = mark_partial(ai_response, cancel_token)
+            except asyncio.TimeoutError:
+                cancel_token.cancel("timeout")
+                ai_response = "".join(parts)
+                yield sse_event({"detail": "Timed out waiting for the model to respond"}, event="error")
+            except asyncio.CancelledError:
+                # The client closed the stream: stop generating and keep what was produced
+                cancel_token.cancel("disconnected")
+                new_message.append({
+                    "sender": "bot",
+                    "message": mark_partial("".join(parts), cancel_token),
+                    "timestamp": datetime.now(timezone.utc)
+                })
+                # This task is already cancelled, so an await here would be cancelled too; save in the background
+                in_background(cache.update(context_id, user["_id"], new_message, summary=summary), "context_update", context_id=context_id)
+                raise
+            except Exception as e:
+                ai_response = f"An error occurred while generating the response: {str(e)}"
+                yield sse_event({"detail": ai_response}, event="error")
+        elif mode == "notmodel":
+            ai_response = "This is chat message after first response without model"
+            yield sse_event({"token": ai_response})
+        else:
+            ai_response = "Invalid mode provided. Please use 'model' or 'notmodel'"
+            yield sse_event({"token": ai_response})
+
+        new_message.append({
+            "sender": "bot",
+            "message": ai_response,
+            "timestamp": datetime.now(timezone.utc)
+        })
+        # Persist the assembled answer exactly like the non-streaming route
+        await cache.update(context_id, user["_id"], new_message, summary=summary)
+        yield sse_event(new_message, event="done")
+
+    return StreamingResponse(event_stream(), media_type="text/event-stream", headers={"Cache-Control": "no-cache"})
+
+
 # @router.post("/{context_id}")
 # async def post_chat_to_context(context_id: str, chat_request: Request, user: User = Depends(get_current_user)):
 #     chat_document = await chat_request.json()
@@ -0,0 +1,33 @@
+import asyncio
+from fastapi import APIRouter
+from core.inference import inference_executor
+from core.model_manager import model_manager
+from core.model_client import model_client
+from core.kv_cache import prefix_cache
+from core.vision_cache import vision_cache
+from core.frame_cache import frame_cache
+from core.pdf_extract import pdf_extractor
+from redisDB.database import answer_cache
+from core.storage import storage
+
+router = APIRouter()
+
+
+# GET /stats - Queue depth and cache hit/miss counters of the inference path
+@router.get("/stats")
+async def get_inference_stats():
+    stats = {
+        "executor": inference_executor.stats(),
+        "answer_cache": await answer_cache.stats(),
+        "storage": storage.stats(),
+    }
+    if model_manager.remote:
+        # Model-side caches live in the model server process
+        return {**stats, **await asyncio.to_thread(model_client.stats)}
+    return {
+        **stats,
+        "prefix_cache": prefix_cache.stats(),
+        "vision_cache": vision_cache.stats(),
+        "frame_cache": frame_cache.stats(),
+        "pdf_cache": pdf_extractor.stats(),
+    }
@@ -2,9 +2,11 @@ from fastapi import APIRouter, UploadFile, HTTPException, Form
 from pathlib import Path
 from typing import Optional
 import os
-import time
+from core.storage import storage
+from core.log import get_logger
 
 router = APIRouter()
+log = get_logger("train")
 
 UPLOAD_FOLDER = Path("uploads")
 TEMP_FOLDER = Path("temp")
@@ -20,30 +22,18 @@ async def upload_chunk(
 ):
     try:
         temp_folder = TEMP_FOLDER /file_name
-        temp_folder.mkdir(exist_ok=True)
+        await storage.makedirs(temp_folder)
 
         chunk_path = temp_folder /f"chunk_{chunk_number}"
-        with open(chunk_path, "wb") as buffer:
-            buffer.write(await file.read())
+        await storage.write_bytes(chunk_path, await file.read())
 
         if chunk_number == total_chunks:
             final_file_path = UPLOAD_FOLDER / file_name
 
-            if final_file_path.exists():
-                final_file_path.unlink()
-
-            with open(final_file_path, "wb") as final_file:
-                print('11')
-                for i in range(1, total_chunks + 1):
-                    chunk_file_path = temp_folder / f"chunk_{i}"
-                    with open(chunk_file_path, "rb") as chunk_file:
-                        print(f"Combining chunk {i}")
-                        final_file.write(chunk_file.read())
-
-            time.sleep(1) 
-            for chunk_file in temp_folder.iterdir():
-                chunk_file.unlink()
-            temp_folder.rmdir()
+            # Opening the final file for writing truncates any earlier upload of the same name
+            await storage.concat([temp_folder / f"chunk_{i}" for i in range(1, total_chunks + 1)], final_file_path)
+            await storage.remove_tree(temp_folder)
+            log.info("upload_combined", file=file_name, chunks=total_chunks, sampled=False)
 
             if file_type == "json":
                 print(f"Processing JSON file: {final_file_path}")
@@ -7,8 +7,16 @@ from core.database import db
 from bson import ObjectId
 import os
 from core.middleware import get_current_user
+from core.storage import storage
 router = APIRouter()
 
+
+def save_png(data: bytes, image_path: Path):
+    image = Image.open(BytesIO(data))
+    image = image.convert("RGB")  # Convert image to RGB to avoid issues with transparency
+    image.save(image_path, "PNG", quality=85)  # Save the image as PNG
+
+
 # Image upload route
 @router.post("/upload/{context_id}")
 async def upload_image(context_id: str, file: UploadFile = File(...), user: User = Depends(get_current_user)):
@@ -27,19 +35,17 @@ async def upload_image(context_id: str, file: UploadFile = File(...), user: User
         base_upload_folder = Path("upload")
         user_folder = base_upload_folder / str(user.id)
         context_folder = user_folder / str(context_id)
-        context_folder.mkdir(parents=True, exist_ok=True)  # Create directories if they don't exist
+        await storage.makedirs(context_folder)  # Create directories if they don't exist
 
-        existing_files = list(context_folder.glob("*"))
+        existing_files = await storage.run("disk_list", os.listdir, context_folder)
         next_index = len(existing_files) + 1
 
         # Define the image file path
         image_path = context_folder / f"{next_index}"
 
-        # Process and save the image
+        # Decode, re-encode and save the image on the storage pool
         try:
-            image = Image.open(BytesIO(await file.read()))
-            image = image.convert("RGB")  # Convert image to RGB to avoid issues with transparency
-            image.save(image_path, "PNG", quality=85)  # Save the image as PNG
+            await storage.write("png_encode_write", save_png, await file.read(), image_path)
         except Exception as e:
             raise HTTPException(status_code=400, detail=f"Error processing the image: {str(e)}")
 
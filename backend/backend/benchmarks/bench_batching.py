@@ -0,0 +1,80 @@
+"""
+Tokens/s of concurrent text chats with and without the batching scheduler.
+
+Run from backend/backend (needs the model weights and MODE="model"):
+    python -m benchmarks.bench_batching --concurrency 1 4 16
+"""
+import argparse
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor
+from core.model import process_inputs_with_model
+from core.model_manager import model_manager
+from core.batching import batch_scheduler
+import core.model as shakti
+
+PROMPTS = [
+    "Summarise the main threats an infantry patrol faces in mountainous terrain.",
+    "List the key components of a forward operating base.",
+    "Explain the difference between reconnaissance and surveillance.",
+    "What should be checked before a convoy departs?",
+    "Describe standard signs of a concealed improvised explosive device.",
+    "How is a defensive perimeter usually organised?",
+    "Give three ways to reduce the thermal signature of a vehicle.",
+    "What information goes into a situation report?",
+]
+
+
+def run(concurrency, requests_per_worker, max_new_tokens):
+    def one_chat(i):
+        text = process_inputs_with_model(
+            model_manager.model,
+            model_manager.processor,
+            model_manager.tokenizer,
+            PROMPTS[i % len(PROMPTS)],
+            max_new_tokens=max_new_tokens
+        )
+        return len(model_manager.tokenizer(text, add_special_tokens=False).input_ids)
+
+    total = concurrency * requests_per_worker
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        tokens = sum(pool.map(one_chat, range(total)))
+    elapsed = time.perf_counter() - start
+    return {
+        "concurrency": concurrency,
+        "requests": total,
+        "tokens": tokens,
+        "seconds": round(elapsed, 3),
+        "tokens_per_s": round(tokens / elapsed, 2),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 4, 16])
+    parser.add_argument("--requests-per-worker", type=int, default=2)
+    parser.add_argument("--max-new-tokens", type=int, default=500)
+    args = parser.parse_args()
+
+    if model_manager.mode != "model":
+        raise SystemExit('Set MODE="model" in config_model.py to benchmark generation.')
+    model_manager.load()
+    batch_scheduler.start(model_manager.model, model_manager.tokenizer)
+
+    results = []
+    for batching in (False, True):
+        shakti.BATCHING_ENABLED = batching
+        for concurrency in args.concurrency:
+            result = run(concurrency, args.requests_per_worker, args.max_new_tokens)
+            result["batching"] = batching
+            results.append(result)
+            print(json.dumps(result))
+
+    print(f"\n{'batching':>9} {'conc':>5} {'tokens/s':>10}")
+    for r in results:
+        print(f"{str(r['batching']):>9} {r['concurrency']:>5} {r['tokens_per_s']:>10}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,65 @@
+"""
+Generate latency per prompt bucket with the eager and the torch.compile'd language model.
+Reports the first call (compilation for the compiled model) and the best of the following calls.
+
+Run from backend/backend (needs the model weights and MODE="model"):
+    python -m benchmarks.bench_compile --max-new-tokens 32 --repeats 3
+"""
+import argparse
+import json
+import time
+import torch
+from core.compilation import compile_model
+import core.model_manager as manager
+from config_model import COMPILE_PROMPT_BUCKETS
+
+
+def time_bucket(model, tokenizer, bucket, max_new_tokens, repeats):
+    # A prompt filling the whole bucket, as a long chat history would
+    sentence = tokenizer("Describe the terrain around the river crossing. ", return_tensors="pt").input_ids
+    prompt_ids = sentence.repeat(1, bucket // sentence.shape[-1] + 1)[:, :bucket]
+    inputs = {"input_ids": prompt_ids.to(model.device), "attention_mask": torch.ones_like(prompt_ids).to(model.device)}
+    timings = []
+    for _ in range(repeats + 1):
+        start = time.perf_counter()
+        with torch.no_grad():
+            model.generate(**inputs, tokenizer=tokenizer, max_new_tokens=max_new_tokens, decode_text=True)
+        timings.append(time.perf_counter() - start)
+    return {
+        "bucket": bucket,
+        "first_seconds": round(timings[0], 3),
+        "steady_seconds": round(min(timings[1:]), 3),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--max-new-tokens", type=int, default=32)
+    parser.add_argument("--repeats", type=int, default=3)
+    args = parser.parse_args()
+
+    model_manager = manager.model_manager
+    if model_manager.mode != "model":
+        raise SystemExit('Set MODE="model" in config_model.py to benchmark generation.')
+    # Load eagerly; compilation is applied below so both runs share the same weights
+    manager.COMPILE_ENABLED = False
+    model_manager.load()
+    model, tokenizer = model_manager.model, model_manager.tokenizer
+
+    results = []
+    for compiled in (False, True):
+        if compiled:
+            compile_model(model)
+        for bucket in sorted(COMPILE_PROMPT_BUCKETS):
+            result = time_bucket(model, tokenizer, bucket, args.max_new_tokens, args.repeats)
+            result["compiled"] = compiled
+            results.append(result)
+            print(json.dumps(result))
+
+    print(f"\n{'compiled':>8} {'bucket':>7} {'first s':>9} {'steady s':>9}")
+    for r in results:
+        print(f"{str(r['compiled']):>8} {r['bucket']:>7} {r['first_seconds']:>9} {r['steady_seconds']:>9}")
+
+
+if __name__ == "__main__":
+    main()
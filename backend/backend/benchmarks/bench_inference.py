@@ -0,0 +1,212 @@
+"""
+Replays text, image, video and PDF chat workloads through analyze() at fixed concurrency and
+writes p50/p95/p99 latency, throughput and peak RSS as JSON, to compare runs between commits.
+
+By default a tiny randomly initialised stand-in model (benchmarks/stand_in.py) replaces the
+Shakti weights, so this runs on a CPU-only box; pass --real to load shakti-2B-041224 instead.
+Synthetic media is written to the images/videos/pdfs folders under a bench_ prefix.
+Video workloads need opencv-python to write the clips, or an existing clip given with --video.
+
+Run from backend/backend:
+    python -m benchmarks.bench_inference --workloads text image pdf --concurrency 1 4 --output report.json
+"""
+import argparse
+import json
+import os
+import resource
+import subprocess
+import time
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+from prometheus_client import REGISTRY
+from PIL import Image
+import fitz  # PyMuPDF, already used for PDF processing
+from core.model import analyze
+from core.model_manager import model_manager
+from core.cpu_profile import rss_mb
+from benchmarks.stand_in import load_stand_in
+from config_model import BASE_DIR
+
+try:
+    import cv2
+except ImportError:
+    cv2 = None
+
+WORKLOADS = ("text", "image", "video", "pdf")
+QUESTIONS = [
+    "Summarise the main threats an infantry patrol faces in mountainous terrain.",
+    "What is shown here? List the vehicles and structures.",
+    "Describe what happens over time.",
+    "What are the key points of this document?",
+]
+
+
+def media_dir(kind: str) -> str:
+    return os.path.join(BASE_DIR, "backend", kind)
+
+
+def make_images(count: int) -> list:
+    names = []
+    rng = np.random.default_rng(0)
+    for i in range(count):
+        name = f"bench_{i}.png"
+        pixels = rng.integers(0, 256, size=(448, 448, 3), dtype=np.uint8)
+        Image.fromarray(pixels).save(os.path.join(media_dir("images"), name))
+        names.append(name)
+    return names
+
+
+def make_videos(count: int, video: str = None) -> list:
+    if video:
+        return [os.path.basename(video)]
+    if cv2 is None:
+        return []
+    names = []
+    rng = np.random.default_rng(1)
+    for i in range(count):
+        name = f"bench_{i}.mp4"
+        writer = cv2.VideoWriter(os.path.join(media_dir("videos"), name), cv2.VideoWriter_fourcc(*"mp4v"), 10, (320, 240))
+        for _ in range(100):
+            writer.write(rng.integers(0, 256, size=(240, 320, 3), dtype=np.uint8))
+        writer.release()
+        names.append(name)
+    return names
+
+
+def make_pdfs(count: int) -> list:
+    names = []
+    rng = np.random.default_rng(2)
+    paragraph = " ".join(QUESTIONS) * 10
+    for i in range(count):
+        name = f"bench_{i}.pdf"
+        with fitz.open() as pdf:
+            for page_number in range(4):
+                page = pdf.new_page()
+                page.insert_textbox(fitz.Rect(36, 36, 560, 500), f"Page {page_number + 1}. {paragraph}")
+                pixels = rng.integers(0, 256, size=(128, 128, 3), dtype=np.uint8)
+                image = fitz.Pixmap(fitz.csRGB, 128, 128, pixels.tobytes(), False)
+                page.insert_image(fitz.Rect(36, 520, 292, 776), pixmap=image)
+            pdf.save(os.path.join(media_dir("pdfs"), name))
+        names.append(name)
+    return names
+
+
+def request_args(workload: str, i: int, media: dict) -> dict:
+    if workload == "text":
+        return {"query": QUESTIONS[i % len(QUESTIONS)] + f" ({i})"}
+    files = media[workload]
+    return {"query": QUESTIONS[i % len(QUESTIONS)], f"{workload}_files": [files[i % len(files)]]}
+
+
+def percentile(values: list, q: float):
+    return round(float(np.percentile(values, q)), 4) if values else None
+
+
+def vision_tokens_saved() -> float:
+    return sum(
+        REGISTRY.get_sample_value("shakti_vision_tokens_saved_total", {"source": source}) or 0
+        for source in ("video", "pdf")
+    )
+
+
+def run(workload: str, concurrency: int, requests: int, media: dict) -> dict:
+    tokenizer = model_manager.tokenizer
+    saved_before = vision_tokens_saved()
+
+    def one_request(i):
+        """(latency, tokens) of a successful request, None for a failed one."""
+        start = time.perf_counter()
+        try:
+            # analyze() logs and swallows its own exceptions, returning None
+            text = analyze(**request_args(workload, i, media))
+        except Exception as e:
+            print(f"Request {i} of the {workload} workload failed: {e}")
+            return None
+        if text is None:
+            return None
+        return time.perf_counter() - start, len(tokenizer(text, add_special_tokens=False).input_ids)
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        results = list(pool.map(one_request, range(requests)))
+    elapsed = time.perf_counter() - start
+    # Failures are reported as errors and left out of latency and throughput
+    succeeded = [result for result in results if result is not None]
+    latencies = [latency for latency, _ in succeeded]
+    tokens = sum(count for _, count in succeeded)
+    return {
+        "workload": workload,
+        "concurrency": concurrency,
+        "requests": requests,
+        "errors": requests - len(succeeded),
+        "seconds": round(elapsed, 3),
+        "p50_seconds": percentile(latencies, 50),
+        "p95_seconds": percentile(latencies, 95),
+        "p99_seconds": percentile(latencies, 99),
+        "requests_per_s": round(len(succeeded) / elapsed, 3),
+        "tokens_per_s": round(tokens / elapsed, 2),
+        "vision_tokens_saved_per_request": round((vision_tokens_saved() - saved_before) / requests, 1),
+        "rss_mb": rss_mb(),
+    }
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workloads", nargs="+", choices=WORKLOADS, default=list(WORKLOADS))
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 4])
+    parser.add_argument("--requests", type=int, default=16, help="Requests per workload and concurrency level")
+    parser.add_argument("--media-variants", type=int, default=4, help="Distinct files per media workload")
+    parser.add_argument("--video", help="Existing clip inside backend/videos to use for the video workload")
+    parser.add_argument("--real", action="store_true", help="Load the real shakti-2B-041224 weights")
+    parser.add_argument("--output", help="Also write the report to this file")
+    args = parser.parse_args()
+
+    model_manager.mode = "model"
+    if not args.real:
+        model_manager.loader = load_stand_in
+    model_manager.load()
+    if not model_manager.ready:
+        raise SystemExit(f"Model failed to load: {model_manager.error}")
+
+    for kind in ("images", "videos", "pdfs"):
+        os.makedirs(media_dir(kind), exist_ok=True)
+    media = {
+        "image": make_images(args.media_variants) if "image" in args.workloads else [],
+        "video": make_videos(args.media_variants, args.video) if "video" in args.workloads else [],
+        "pdf": make_pdfs(args.media_variants) if "pdf" in args.workloads else [],
+    }
+
+    runs = []
+    for workload in args.workloads:
+        if workload != "text" and not media[workload]:
+            print(f"Skipping the {workload} workload: no media (install opencv-python or pass --video).")
+            continue
+        for concurrency in args.concurrency:
+            result = run(workload, concurrency, args.requests, media)
+            runs.append(result)
+            print(json.dumps(result))
+
+    report = {
+        "commit": git_commit(),
+        "model": "shakti-2B-041224" if args.real else "stand-in",
+        "device": model_manager.status()["device"],
+        "load_timings": model_manager.timings,
+        # ru_maxrss is in KiB on Linux
+        "peak_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+        "runs": runs,
+    }
+    print(json.dumps(report, indent=2))
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
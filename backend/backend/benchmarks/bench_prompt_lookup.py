@@ -0,0 +1,94 @@
+"""
+Tokens/s of questions about uploaded PDFs with prompt-lookup speculative decoding on and off.
+
+PDFs are given by file name inside backend/pdfs, the same way chats reference them. An untimed pass
+first fills the PDF extraction and vision caches, batching is turned off so neither mode waits for a
+batch to fill, and the on/off order alternates between repetitions.
+Run from backend/backend (needs the model weights and MODE="model"):
+    python -m benchmarks.bench_prompt_lookup --pdfs report.pdf manual.pdf
+"""
+import argparse
+import json
+import time
+from core.model import process_inputs_with_model
+from core.model_manager import model_manager
+import core.model as shakti
+
+QUESTIONS = [
+    "Summarise this document.",
+    "Quote the sentences that describe the main findings.",
+    "List every date and place mentioned in the document.",
+    "What recommendations does the document make? Use its wording.",
+]
+
+
+def ask(pdf, question, max_new_tokens) -> str:
+    return process_inputs_with_model(
+        model_manager.model,
+        model_manager.processor,
+        model_manager.tokenizer,
+        question,
+        pdfs=[pdf],
+        max_new_tokens=max_new_tokens
+    )
+
+
+def run(pdfs, max_new_tokens):
+    """(tokens, seconds) of every question about every PDF."""
+    tokens = 0
+    elapsed = 0.0
+    for pdf in pdfs:
+        for question in QUESTIONS:
+            start = time.perf_counter()
+            text = ask(pdf, question, max_new_tokens)
+            elapsed += time.perf_counter() - start
+            tokens += len(model_manager.tokenizer(text, add_special_tokens=False).input_ids)
+    return tokens, elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pdfs", nargs="+", required=True)
+    parser.add_argument("--max-new-tokens", type=int, default=500)
+    parser.add_argument("--repeats", type=int, default=2, help="Passes per mode; the order alternates between them")
+    args = parser.parse_args()
+
+    if model_manager.mode != "model":
+        raise SystemExit('Set MODE="model" in config_model.py to benchmark generation.')
+    model_manager.load()
+    # Prompt lookup bypasses the batch scheduler, so with batching on only the "off" pass would wait for batches
+    shakti.BATCHING_ENABLED = False
+
+    # Untimed: extracts every PDF once so neither mode pays the cold extraction cache
+    for pdf in args.pdfs:
+        ask(pdf, QUESTIONS[0], 8)
+
+    totals = {False: [0, 0.0], True: [0, 0.0]}
+    for repeat in range(args.repeats):
+        for prompt_lookup in ((False, True) if repeat % 2 == 0 else (True, False)):
+            shakti.PROMPT_LOOKUP_ENABLED = prompt_lookup
+            tokens, elapsed = run(args.pdfs, args.max_new_tokens)
+            totals[prompt_lookup][0] += tokens
+            totals[prompt_lookup][1] += elapsed
+
+    results = []
+    for prompt_lookup in (False, True):
+        tokens, elapsed = totals[prompt_lookup]
+        result = {
+            "prompt_lookup": prompt_lookup,
+            "requests": len(args.pdfs) * len(QUESTIONS) * args.repeats,
+            "tokens": tokens,
+            "seconds": round(elapsed, 3),
+            "tokens_per_s": round(tokens / elapsed, 2),
+        }
+        results.append(result)
+        print(json.dumps(result))
+
+    print(f"\n{'prompt_lookup':>13} {'tokens/s':>10}")
+    for r in results:
+        print(f"{str(r['prompt_lookup']):>13} {r['tokens_per_s']:>10}")
+    print(f"speedup: {round(results[1]['tokens_per_s'] / results[0]['tokens_per_s'], 2)}x")
+
+
+if __name__ == "__main__":
+    main()
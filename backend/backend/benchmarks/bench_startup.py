@@ -0,0 +1,63 @@
+"""
+Cold-start timings of the API: time until the port accepts requests and
+time until /health/ready turns true. Uses MODE from config_model.py, so run
+once with MODE="model" and once with MODE="notmodel" to compare.
+
+Run from backend/backend:
+    python -m benchmarks.bench_startup --port 8765
+"""
+import argparse
+import json
+import subprocess
+import sys
+import time
+import urllib.error
+import urllib.request
+
+
+def poll(url, timeout):
+    """Seconds until url answers at all, and its last status and body."""
+    start = time.perf_counter()
+    while time.perf_counter() - start < timeout:
+        try:
+            with urllib.request.urlopen(url, timeout=1) as response:
+                return response.status, json.loads(response.read())
+        except urllib.error.HTTPError as e:
+            return e.code, json.loads(e.read())
+        except (urllib.error.URLError, ConnectionError):
+            time.sleep(0.05)
+    raise TimeoutError(f"{url} did not answer within {timeout}s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--timeout", type=float, default=600)
+    args = parser.parse_args()
+
+    base = f"http://127.0.0.1:{args.port}"
+    start = time.perf_counter()
+    server = subprocess.Popen([sys.executable, "-m", "uvicorn", "main:app", "--port", str(args.port)])
+    try:
+        poll(f"{base}/", args.timeout)
+        bound = time.perf_counter() - start
+        while True:
+            status, body = poll(f"{base}/health/ready", args.timeout)
+            if status == 200 or body.get("error"):
+                break
+            time.sleep(0.2)
+        ready = time.perf_counter() - start
+        print(json.dumps({
+            "mode": body.get("mode"),
+            "port_bound_seconds": round(bound, 3),
+            "ready_seconds": round(ready, 3),
+            "server_timings": body.get("timings"),
+            "error": body.get("error"),
+        }, indent=2))
+    finally:
+        server.terminate()
+        server.wait()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,114 @@
+"""
+Time of sampling frames from long videos: the previous encode_video (every sampled frame decoded
+at full resolution, then converted to PIL one by one) against the current one, with and without
+keyframe snapping. Needs no model weights. Frame selection is turned off so every variant
+decodes the same number of frames.
+
+Synthetic clips are written with opencv-python to a temp directory (or pass existing clips with --videos).
+Run from backend/backend:
+    python -m benchmarks.bench_video_decode --minutes 5 30 --resolution 1280x720
+"""
+import argparse
+import json
+import os
+import tempfile
+import time
+import numpy as np
+from PIL import Image
+from decord import VideoReader, cpu
+import core.model as shakti
+from core.cpu_profile import rss_mb
+
+try:
+    import cv2
+except ImportError:
+    cv2 = None
+
+
+def legacy_encode_video(video):
+    """encode_video as it was before frame positions were computed up front."""
+    def uniform_sample(l, n):
+        gap = len(l) / n
+        idxs = [int(i * gap + gap / 2) for i in range(n)]
+        return [l[i] for i in idxs]
+
+    vr = VideoReader(video, ctx=cpu(0))
+    sample_fps = round(vr.get_avg_fps() / 1)
+    frame_idx = [i for i in range(0, len(vr), sample_fps)]
+    if len(frame_idx) > shakti.MAX_NUM_FRAMES:
+        frame_idx = uniform_sample(frame_idx, shakti.MAX_NUM_FRAMES)
+    frames = vr.get_batch(frame_idx).asnumpy()
+    return [Image.fromarray(v.astype('uint8')) for v in frames]
+
+
+def make_video(path: str, minutes: float, width: int, height: int, fps: int = 25):
+    """A moving gradient with a slowly changing tint, so frames differ and compress like real footage."""
+    writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*"mp4v"), fps, (width, height))
+    x = np.linspace(0, 255, width, dtype=np.float32)
+    y = np.linspace(0, 255, height, dtype=np.float32)[:, None]
+    for i in range(int(minutes * 60 * fps)):
+        shift = (i * 4) % width
+        frame = np.empty((height, width, 3), dtype=np.uint8)
+        frame[..., 0] = np.roll(x, shift)[None, :]
+        frame[..., 1] = y
+        frame[..., 2] = (i // fps) % 256
+        writer.write(frame)
+    writer.release()
+
+
+def timed_run(fn, video, repeats):
+    best = None
+    for _ in range(repeats):
+        start = time.perf_counter()
+        frames = fn(video)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    if isinstance(frames, np.ndarray):
+        nbytes = frames.nbytes
+    else:
+        nbytes = sum(len(frame.tobytes()) for frame in frames)
+    return {"seconds": round(best, 3), "frames": len(frames), "output_mb": round(nbytes / 1024 ** 2, 2)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--minutes", type=float, nargs="+", default=[5, 30], help="Lengths of the synthetic clips")
+    parser.add_argument("--resolution", default="1280x720")
+    parser.add_argument("--videos", nargs="+", help="Existing clips to use instead of synthetic ones")
+    parser.add_argument("--repeats", type=int, default=3, help="Runs per variant; the fastest is reported")
+    args = parser.parse_args()
+    shakti.VISION_DEDUP_ENABLED = False
+
+    with tempfile.TemporaryDirectory() as tmp:
+        videos = args.videos
+        if not videos:
+            if cv2 is None:
+                raise SystemExit("Install opencv-python to write synthetic clips, or pass --videos.")
+            width, height = (int(v) for v in args.resolution.split("x"))
+            videos = []
+            for minutes in args.minutes:
+                path = os.path.join(tmp, f"bench_{minutes:g}min.mp4")
+                print(f"Writing a {minutes:g} minute {args.resolution} clip...")
+                make_video(path, minutes, width, height)
+                videos.append(path)
+
+        results = []
+        for video in videos:
+            variants = {"legacy": legacy_encode_video}
+            for snap in (False, True):
+                def encode(v, snap=snap):
+                    shakti.VIDEO_SNAP_TO_KEYFRAMES = snap
+                    return shakti.encode_video(v)
+                variants["sampled_snap" if snap else "sampled_exact"] = encode
+            for name, fn in variants.items():
+                result = {"video": os.path.basename(video), "variant": name, **timed_run(fn, video, args.repeats), "rss_mb": rss_mb()}
+                results.append(result)
+                print(json.dumps(result))
+
+    print(f"\n{'video':>24} {'variant':>14} {'seconds':>8} {'output MB':>10}")
+    for r in results:
+        print(f"{r['video']:>24} {r['variant']:>14} {r['seconds']:>8} {r['output_mb']:>10}")
+
+
+if __name__ == "__main__":
+    main()
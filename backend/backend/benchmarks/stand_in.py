@@ -0,0 +1,130 @@
+"""
+Tiny randomly initialised stand-in for the Shakti model, tokenizer and processor.
+It exposes the same interface the serving code uses (processor(messages, images=, videos=),
+model.generate(..., tokenizer=, decode_text=True), model.forward_image, model.language_model),
+so the whole inference path can be benchmarked on a CPU box without the real weights.
+Answers are random bytes; only the timings mean anything.
+"""
+import numpy as np
+import torch
+from torch import nn
+from transformers import BatchFeature, LlamaConfig, LlamaForCausalLM
+from core.model_manager import DEVICE
+
+IMAGE_SIZE = 64
+
+
+class ByteTokenizer:
+    """UTF-8 bytes as tokens, plus pad/eos/bos ids after the 256 byte values."""
+
+    pad_token_id = 256
+    eos_token_id = 257
+    bos_token_id = 258
+    vocab_size = 259
+
+    def __call__(self, text, return_tensors=None, add_special_tokens=True):
+        ids = self.encode(text, add_special_tokens=add_special_tokens)
+        input_ids = torch.tensor([ids]) if return_tensors == "pt" else ids
+        return BatchFeature({"input_ids": input_ids})
+
+    def encode(self, text, add_special_tokens=True):
+        ids = list(text.encode("utf-8"))
+        return [self.bos_token_id] + ids if add_special_tokens else ids
+
+    def decode(self, ids, skip_special_tokens=True, **kwargs):
+        if torch.is_tensor(ids):
+            ids = ids.tolist()
+        return bytes(i for i in ids if i < 256).decode("utf-8", errors="ignore")
+
+    def batch_decode(self, sequences, **kwargs):
+        return [self.decode(ids, **kwargs) for ids in sequences]
+
+
+class TinyProcessor:
+    """Flattens the chat messages into byte tokens and resizes every image and video frame to IMAGE_SIZE."""
+
+    def __init__(self, tokenizer: ByteTokenizer):
+        self.tokenizer = tokenizer
+
+    def __call__(self, messages, images=None, videos=None):
+        text = "".join(f"<|{message['role']}|>{message['content']}" for message in messages)
+        frames = list(images or [])
+        for video in videos or []:
+            frames.extend(video)
+        input_ids = torch.tensor([self.tokenizer.encode(text)])
+        features = {
+            "input_ids": input_ids,
+            "attention_mask": torch.ones_like(input_ids),
+            "pixel_values": None,
+            "media_offset": None,
+        }
+        if frames:
+            pixels = np.stack([
+                np.asarray(frame.convert("RGB").resize((IMAGE_SIZE, IMAGE_SIZE)), dtype=np.float32) / 255
+                for frame in frames
+            ])
+            features["pixel_values"] = torch.from_numpy(pixels).permute(0, 3, 1, 2).contiguous()
+            features["media_offset"] = [torch.zeros(len(frames), dtype=torch.long)]
+        return BatchFeature(features)
+
+
+class TinyShakti(nn.Module):
+    """
+    Two-layer Llama decoder plus a small convolutional vision encoder.
+    Image features are computed through forward_image (so the vision cache is exercised)
+    but the decoder does not attend to them.
+    """
+
+    def __init__(self, vocab_size: int, hidden_size: int = 128, layers: int = 2):
+        super().__init__()
+        config = LlamaConfig(
+            vocab_size=vocab_size,
+            hidden_size=hidden_size,
+            intermediate_size=hidden_size * 4,
+            num_hidden_layers=layers,
+            num_attention_heads=4,
+            num_key_value_heads=4,
+            max_position_embeddings=8192,
+            pad_token_id=ByteTokenizer.pad_token_id,
+            eos_token_id=ByteTokenizer.eos_token_id,
+            bos_token_id=ByteTokenizer.bos_token_id,
+        )
+        self.language_model = LlamaForCausalLM(config)
+        self.vision_model = nn.Sequential(
+            nn.Conv2d(3, 32, kernel_size=8, stride=8),
+            nn.GELU(),
+            nn.Conv2d(32, hidden_size, kernel_size=2, stride=2),
+            nn.Flatten(2),
+        )
+
+    @property
+    def device(self):
+        return next(self.parameters()).device
+
+    @property
+    def dtype(self):
+        return next(self.parameters()).dtype
+
+    def forward_image(self, pixel_values):
+        return self.vision_model(pixel_values.to(self.dtype)).transpose(1, 2)
+
+    def generate(self, input_ids, attention_mask=None, pixel_values=None, media_offset=None,
+                 tokenizer=None, decode_text=False, **generate_kwargs):
+        if pixel_values is not None:
+            self.forward_image(pixel_values)
+        # Greedy decoding keeps runs comparable between commits
+        generate_kwargs.setdefault("do_sample", False)
+        generate_kwargs.setdefault("pad_token_id", ByteTokenizer.pad_token_id)
+        output = self.language_model.generate(input_ids=input_ids, attention_mask=attention_mask, **generate_kwargs)
+        output = output[:, input_ids.shape[-1]:]
+        if decode_text:
+            return tokenizer.batch_decode(output, skip_special_tokens=True)
+        return output
+
+
+def load_stand_in(model_dir=None):
+    """Drop-in for core.model_manager.load_model; model_dir is ignored."""
+    torch.manual_seed(0)
+    tokenizer = ByteTokenizer()
+    model = TinyShakti(tokenizer.vocab_size).eval().to(DEVICE)
+    return model, tokenizer, TinyProcessor(tokenizer)
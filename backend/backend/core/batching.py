@@ -0,0 +1,149 @@
+import os
+import sys
+import threading
+import time
+from concurrent.futures import Future
+import torch
+from transformers import StoppingCriteriaList
+
+# Add the project's top-level directory to sys.path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "../..")))
+from config_model import BATCH_MAX_SIZE, BATCH_WAIT_MS
+from core.cancellation import CancellationCriteria
+from core.metrics import GenerationTimer
+
+# Processor outputs that can be left-padded and stacked across requests
+TEXT_KEYS = {"input_ids", "attention_mask"}
+
+
+def _is_empty(value):
+    if value is None:
+        return True
+    if torch.is_tensor(value):
+        return value.numel() == 0
+    if isinstance(value, (list, tuple)):
+        return all(_is_empty(v) for v in value)
+    return False
+
+
+def is_text_only(inputs):
+    return all(key in TEXT_KEYS or _is_empty(value) for key, value in inputs.items())
+
+
+def collate(batch_inputs, pad_token_id):
+    """Left-pad the input_ids/attention_mask of several text-only requests into one batch."""
+    max_len = max(inputs["input_ids"].shape[-1] for inputs in batch_inputs)
+    input_ids, attention_mask = [], []
+    for inputs in batch_inputs:
+        ids = inputs["input_ids"].reshape(-1)
+        mask = inputs.get("attention_mask")
+        mask = mask.reshape(-1) if mask is not None else torch.ones_like(ids)
+        pad = max_len - ids.shape[0]
+        input_ids.append(torch.cat([ids.new_full((pad,), pad_token_id), ids]))
+        attention_mask.append(torch.cat([mask.new_zeros(pad), mask]))
+    return {
+        "input_ids": torch.stack(input_ids),
+        "attention_mask": torch.stack(attention_mask),
+    }
+
+
+class BatchScheduler:
+    """
+    Gathers generate() calls from concurrent chats within a short window and runs
+    them as a single batched model.generate, handing each caller its own output.
+    Meant for text-only prompts: everything runs on the one scheduler thread, so a
+    prompt with media would hold up the rest of the queue without batching.
+    """
+
+    def __init__(self, max_batch_size: int, max_wait_ms: float):
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+        self.model = None
+        self.tokenizer = None
+        self._pending = []
+        self._cond = threading.Condition()
+        self._thread = None
+
+    def start(self, model, tokenizer):
+        """Bind the loaded model and start the scheduling thread."""
+        self.model = model
+        self.tokenizer = tokenizer
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._loop, name="batch-scheduler", daemon=True)
+            self._thread.start()
+
+    def generate(self, inputs, cancel_token=None, **generate_kwargs) -> str:
+        """
+        Queue one request's processor outputs and block until its decoded text is ready.
+        A cancelled cancel_token stops that request's row without affecting the rest of the batch.
+        """
+        future = Future()
+        with self._cond:
+            self._pending.append((dict(inputs), generate_kwargs, cancel_token, future))
+            self._cond.notify()
+        return future.result()
+
+    def _take_batch(self):
+        with self._cond:
+            while not self._pending:
+                self._cond.wait()
+            deadline = time.monotonic() + self.max_wait
+            while len(self._pending) < self.max_batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                self._cond.wait(remaining)
+            batch = self._pending[:self.max_batch_size]
+            del self._pending[:self.max_batch_size]
+        return batch
+
+    def _loop(self):
+        while True:
+            batch = self._take_batch()
+            # Requests batch together only when their outputs can be collated and they share generate kwargs
+            groups = {}
+            for item in batch:
+                inputs, generate_kwargs, cancel_token, future = item
+                # Dropped while waiting for the batch to fill: nothing to generate
+                if cancel_token is not None and cancel_token.should_stop():
+                    future.set_result("")
+                    continue
+                key = (
+                    "text" if is_text_only(inputs) else id(item),
+                    tuple(sorted(generate_kwargs.items()))
+                )
+                groups.setdefault(key, []).append(item)
+            for group in groups.values():
+                self._run(group)
+
+    def _run(self, group):
+        generate_kwargs = group[0][1]
+        try:
+            pad_token_id = self.tokenizer.pad_token_id
+            if pad_token_id is None:
+                pad_token_id = self.tokenizer.eos_token_id
+            if len(group) == 1:
+                inputs = group[0][0]
+            else:
+                inputs = collate([item[0] for item in group], pad_token_id)
+                inputs = {key: value.to(self.model.device) for key, value in inputs.items()}
+            timer = GenerationTimer(inputs["input_ids"].shape[-1], pad_token_id)
+            stopping_criteria = StoppingCriteriaList([CancellationCriteria([item[2] for item in group]), timer])
+            with torch.no_grad():
+                outputs = self.model.generate(
+                    **inputs,
+                    tokenizer=self.tokenizer,
+                    decode_text=True,
+                    stopping_criteria=stopping_criteria,
+                    **generate_kwargs
+                )
+            timer.observe()
+            for (_, _, _, future), output in zip(group, outputs):
+                future.set_result(output)
+        except Exception as e:
+            for _, _, _, future in group:
+                if not future.done():
+                    future.set_exception(e)
+
+
+batch_scheduler = BatchScheduler(max_batch_size=BATCH_MAX_SIZE, max_wait_ms=BATCH_WAIT_MS)
@@ -0,0 +1,51 @@
+import threading
+import time
+import torch
+from transformers import StoppingCriteria
+
+
+class CancellationToken:
+    """
+    Shared between a request handler and the thread generating its answer.
+    Generation checks it between decoding steps and stops when the client went
+    away or the request's deadline passed.
+    """
+
+    def __init__(self, deadline_seconds: float = None):
+        self.deadline = time.monotonic() + deadline_seconds if deadline_seconds is not None else None
+        self._event = threading.Event()
+        self._reason = None
+
+    def cancel(self, reason: str = "cancelled"):
+        if not self._event.is_set():
+            self._reason = reason
+            self._event.set()
+
+    @property
+    def cancelled(self) -> bool:
+        return self._event.is_set()
+
+    def remaining(self):
+        """Seconds left before the deadline, or None without one."""
+        return max(self.deadline - time.monotonic(), 0) if self.deadline is not None else None
+
+    def should_stop(self) -> bool:
+        if self.deadline is not None and not self._event.is_set() and time.monotonic() >= self.deadline:
+            self.cancel("deadline")
+        return self._event.is_set()
+
+    @property
+    def reason(self):
+        """Why generation was stopped: "deadline", "disconnected", "timeout", or None if it ran to completion."""
+        return self._reason
+
+
+class CancellationCriteria(StoppingCriteria):
+    """Stops the rows of a (possibly batched) generate whose request was cancelled or ran out of time."""
+
+    def __init__(self, tokens: list):
+        self.tokens = tokens
+
+    def __call__(self, input_ids, scores, **kwargs):
+        stop = [token is not None and token.should_stop() for token in self.tokens]
+        return torch.tensor(stop, dtype=torch.bool, device=input_ids.device)
@@ -0,0 +1,68 @@
+import os
+import sys
+import time
+import torch
+
+# Add the project's top-level directory to sys.path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "../..")))
+from config_model import COMPILE_MODE, COMPILE_PROMPT_BUCKETS, COMPILE_WARMUP_NEW_TOKENS
+from core.batching import is_text_only
+from core.log import get_logger
+
+log = get_logger("compilation")
+
+
+def bucket_length(length: int) -> int:
+    """Smallest bucket that fits the prompt; prompts beyond the largest bucket keep their length."""
+    for bucket in sorted(COMPILE_PROMPT_BUCKETS):
+        if length <= bucket:
+            return bucket
+    return length
+
+
+def pad_to_length(inputs, length: int, pad_token_id: int):
+    """Left-pad input_ids and attention_mask to length tokens; longer prompts are left as they are."""
+    ids = inputs["input_ids"]
+    pad = length - ids.shape[-1]
+    if pad <= 0:
+        return inputs
+    mask = inputs.get("attention_mask")
+    if mask is None:
+        mask = torch.ones_like(ids)
+    inputs["input_ids"] = torch.cat([ids.new_full((ids.shape[0], pad), pad_token_id), ids], dim=-1)
+    inputs["attention_mask"] = torch.cat([mask.new_zeros((mask.shape[0], pad)), mask], dim=-1)
+    return inputs
+
+
+def pad_to_bucket(inputs, pad_token_id: int):
+    """Left-pad a text-only prompt to its bucket so the compiled forward sees a known shape."""
+    if not is_text_only(inputs):
+        # Media offsets point at token positions, so prompts with images or videos keep their shape
+        return inputs
+    return pad_to_length(inputs, bucket_length(inputs["input_ids"].shape[-1]), pad_token_id)
+
+
+def compile_model(model):
+    """
+    Compile the language model forward in place. Decode steps grow the key/value length by one
+    each time, so shapes are compiled as dynamic instead of specialising on every length.
+    """
+    target = getattr(model, "language_model", model)
+    target.forward = torch.compile(target.forward, mode=COMPILE_MODE, dynamic=True)
+
+
+def warm_up_buckets(model, tokenizer) -> dict:
+    """Run one short generate per prompt bucket so compilation happens before real traffic."""
+    pad_token_id = tokenizer.pad_token_id if tokenizer.pad_token_id is not None else tokenizer.eos_token_id
+    timings = {}
+    prompt_ids = tokenizer("Hello", return_tensors="pt").input_ids
+    for bucket in sorted(COMPILE_PROMPT_BUCKETS):
+        # Padded to the bucket itself: pad_to_bucket would put this short prompt in the smallest one
+        inputs = pad_to_length({"input_ids": prompt_ids, "attention_mask": torch.ones_like(prompt_ids)}, bucket, pad_token_id)
+        inputs = {key: value.to(model.device) for key, value in inputs.items()}
+        start = time.perf_counter()
+        with torch.no_grad():
+            model.generate(**inputs, tokenizer=tokenizer, max_new_tokens=COMPILE_WARMUP_NEW_TOKENS, decode_text=True)
+        timings[bucket] = round(time.perf_counter() - start, 3)
+    log.info("compile_warmup_done", sampled=False, bucket_seconds=timings)
+    return timings
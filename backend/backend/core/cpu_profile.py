@@ -0,0 +1,109 @@
+import gc
+import os
+import sys
+import time
+import torch
+
+# Add the project's top-level directory to sys.path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "../..")))
+from config_model import CPU_QUANTIZE_INT8, CPU_BF16_AUTOCAST, CPU_THREAD_CANDIDATES, CPU_INTEROP_THREADS
+from core.log import get_logger
+
+log = get_logger("cpu_profile")
+
+# Fixed prompt used to compare thread counts and precisions
+BENCHMARK_PROMPT = "Describe the terrain features that matter when planning a patrol route."
+BENCHMARK_NEW_TOKENS = 16
+
+
+def set_interop_threads():
+    """Interop threads can only be set before torch runs any parallel work, so this runs before loading."""
+    try:
+        torch.set_num_interop_threads(CPU_INTEROP_THREADS)
+    except RuntimeError as e:
+        log.warning("interop_threads_not_set", error=str(e))
+
+
+def rss_mb() -> float:
+    """Resident memory of this process in MiB."""
+    with open("/proc/self/statm") as f:
+        pages = int(f.read().split()[1])
+    return round(pages * os.sysconf("SC_PAGE_SIZE") / 1024 ** 2, 1)
+
+
+def time_generate(model, tokenizer, processor, repeats: int = 2) -> float:
+    """Best-of-n latency of a short generate on the fixed prompt."""
+    messages = [
+        {"role": "user", "content": BENCHMARK_PROMPT},
+        {"role": "assistant", "content": ""}
+    ]
+    best = float("inf")
+    for _ in range(repeats):
+        inputs = processor(messages, images=None, videos=None)
+        inputs.update({
+            'tokenizer': tokenizer,
+            'max_new_tokens': BENCHMARK_NEW_TOKENS,
+            'decode_text': True,
+        })
+        start = time.perf_counter()
+        with torch.no_grad():
+            model.generate(**inputs)
+        best = min(best, time.perf_counter() - start)
+    return round(best, 3)
+
+
+def tune_threads(model, tokenizer, processor) -> dict:
+    """Pick the intra-op thread count that generates the fixed prompt fastest."""
+    cpus = os.cpu_count() or 1
+    candidates = CPU_THREAD_CANDIDATES or sorted({cpus, max(cpus // 2, 1), max(cpus // 4, 1)}, reverse=True)
+    timings = {}
+    for threads in candidates:
+        torch.set_num_threads(threads)
+        timings[threads] = time_generate(model, tokenizer, processor)
+    best = min(timings, key=timings.get)
+    torch.set_num_threads(best)
+    return {"threads": best, "thread_timings": timings}
+
+
+def enable_bf16_autocast(model):
+    """Run every generate under CPU bfloat16 autocast."""
+    generate = model.generate
+
+    def generate_bf16(*args, **kwargs):
+        with torch.autocast("cpu", dtype=torch.bfloat16):
+            return generate(*args, **kwargs)
+
+    model.generate = generate_bf16
+
+
+def apply_cpu_profile(model, tokenizer, processor) -> dict:
+    """
+    Tune threading, then apply dynamic int8 quantization to the language model's
+    linear layers and optional bf16 autocast. Returns latency and memory against the fp32 baseline.
+    """
+    report = tune_threads(model, tokenizer, processor)
+    gc.collect()
+    report["fp32"] = {
+        "latency_seconds": report["thread_timings"][report["threads"]],
+        "rss_mb": rss_mb(),
+    }
+
+    if CPU_QUANTIZE_INT8:
+        # Only the language model: the vision tower is a small share of the time and more sensitive to int8
+        target = getattr(model, "language_model", model)
+        torch.ao.quantization.quantize_dynamic(target, {torch.nn.Linear}, dtype=torch.qint8, inplace=True)
+    if CPU_BF16_AUTOCAST:
+        enable_bf16_autocast(model)
+
+    if CPU_QUANTIZE_INT8 or CPU_BF16_AUTOCAST:
+        gc.collect()
+        report["optimized"] = {
+            "int8": CPU_QUANTIZE_INT8,
+            "bf16_autocast": CPU_BF16_AUTOCAST,
+            "latency_seconds": time_generate(model, tokenizer, processor),
+            "rss_mb": rss_mb(),
+        }
+        report["speedup"] = round(report["fp32"]["latency_seconds"] / report["optimized"]["latency_seconds"], 2)
+        report["rss_saved_mb"] = round(report["fp32"]["rss_mb"] - report["optimized"]["rss_mb"], 1)
+    log.info("cpu_profile", sampled=False, report=report)
+    return report
@@ -0,0 +1,92 @@
+import glob
+import os
+import sys
+import threading
+import numpy as np
+
+# Add the project's top-level directory to sys.path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "../..")))
+from config_model import FRAME_CACHE_DIR, FRAME_CACHE_MAX_BYTES
+
+
+class FrameCache:
+    """
+    Sampled frames of videos as .npy files, keyed by the video's SHA-256 and the sampling settings,
+    so a follow-up question about the same video loads them memory-mapped instead of decoding again.
+    The directory is kept under max_bytes by removing the least recently used files.
+    """
+
+    def __init__(self, cache_dir: str, max_bytes: int):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self.counters = {"hits": 0, "misses": 0, "evictions": 0}
+        if cache_dir:
+            os.makedirs(cache_dir, exist_ok=True)
+
+    def _path(self, video_hash: str, sampling: str) -> str:
+        return os.path.join(self.cache_dir, f"{video_hash}.{sampling}.npy")
+
+    def get(self, video_hash: str, sampling: str):
+        if not self.cache_dir:
+            return None
+        path = self._path(video_hash, sampling)
+        try:
+            frames = np.load(path, mmap_mode="r")
+            # The modification time is the LRU order
+            os.utime(path)
+        except (FileNotFoundError, ValueError):
+            self.counters["misses"] += 1
+            return None
+        self.counters["hits"] += 1
+        return frames
+
+    def put(self, video_hash: str, sampling: str, frames: np.ndarray):
+        if not self.cache_dir:
+            return
+        path = self._path(video_hash, sampling)
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "wb") as f:
+            np.save(f, frames)
+        os.replace(tmp_path, path)
+        with self._lock:
+            self._evict()
+
+    def _evict(self):
+        files = glob.glob(os.path.join(self.cache_dir, "*.npy"))
+        sizes = {}
+        for path in files:
+            try:
+                sizes[path] = (os.path.getmtime(path), os.path.getsize(path))
+            except FileNotFoundError:
+                pass
+        total = sum(size for _, size in sizes.values())
+        for path in sorted(sizes, key=lambda p: sizes[p][0]):
+            if total <= self.max_bytes:
+                break
+            total -= sizes[path][1]
+            try:
+                os.remove(path)
+                self.counters["evictions"] += 1
+            except FileNotFoundError:
+                pass
+
+    def drop(self, video_hash: str):
+        """Remove the frames of a video under every sampling setting."""
+        if not self.cache_dir:
+            return
+        for path in glob.glob(os.path.join(self.cache_dir, f"{video_hash}.*.npy")):
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+
+    def stats(self) -> dict:
+        lookups = self.counters["hits"] + self.counters["misses"]
+        return {
+            **self.counters,
+            "hit_rate": self.counters["hits"] / lookups if lookups else 0.0,
+        }
+
+
+frame_cache = FrameCache(cache_dir=FRAME_CACHE_DIR, max_bytes=FRAME_CACHE_MAX_BYTES)
@@ -0,0 +1,46 @@
+import numpy as np
+from PIL import Image
+
+
+def difference_hash(image) -> int:
+    """64-bit dHash: whether each pixel of a 9x8 grayscale thumbnail is brighter than its right neighbour."""
+    if isinstance(image, np.ndarray):
+        image = Image.fromarray(image)
+    pixels = np.asarray(image.convert("L").resize((9, 8), Image.BILINEAR), dtype=np.int16)
+    bits = (pixels[:, 1:] > pixels[:, :-1]).flatten()
+    return int.from_bytes(np.packbits(bits).tobytes(), "big")
+
+
+def hash_distance(a: int, b: int) -> int:
+    return bin(a ^ b).count("1")
+
+
+def select_frames(frames, budget: int, max_distance: int) -> list:
+    """
+    Indices of the video frames to keep, in time order. A frame within max_distance of the last kept
+    one shows the same scene and is dropped; if more than budget frames remain, they are subsampled
+    uniformly, so footage that keeps changing is still covered end to end. The first frame is always kept.
+    """
+    if len(frames) == 0:
+        return []
+    hashes = [difference_hash(frame) for frame in frames]
+    keep = [0]
+    for i in range(1, len(hashes)):
+        if hash_distance(hashes[i], hashes[keep[-1]]) > max_distance:
+            keep.append(i)
+    if len(keep) > budget:
+        gap = len(keep) / budget
+        keep = [keep[int(i * gap)] for i in range(budget)]
+    return keep
+
+
+def distinct_images(images, max_distance: int) -> list:
+    """Indices of the images that are not near-duplicates of an earlier kept one, e.g. repeated scans or logos."""
+    kept_hashes = []
+    keep = []
+    for i, image in enumerate(images):
+        image_hash = difference_hash(image)
+        if all(hash_distance(image_hash, kept) > max_distance for kept in kept_hashes):
+            kept_hashes.append(image_hash)
+            keep.append(i)
+    return keep
@@ -0,0 +1,65 @@
+import os
+import sys
+
+# Add the project's top-level directory to sys.path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "../..")))
+from config_model import HISTORY_TOKEN_BUDGET
+
+
+class HistoryBuilder:
+    """
+    Assembles the conversation history for a prompt within a token budget.
+    The most recent turns are kept verbatim; older turns are folded into a rolling
+    summary that is stored on the chat document and only extended when turns overflow.
+    """
+
+    def __init__(self, token_budget: int):
+        self.token_budget = token_budget
+
+    @staticmethod
+    def count_tokens(tokenizer, text: str) -> int:
+        return len(tokenizer(text, add_special_tokens=False).input_ids)
+
+    def build(self, chats: list, summary: dict, tokenizer, summarize) -> str:
+        """
+        Return the history text for chats.
+        summary is the {"text", "upto"} dict stored with the chat document; it is updated in place
+        when older turns get folded into it, so the caller can persist it.
+        summarize(previous_summary, lines) produces the new summary text.
+        """
+        upto = summary.get("upto", 0)
+        if upto > len(chats):
+            # History was edited or truncated since the summary was made
+            summary.clear()
+            upto = 0
+
+        lines = [f"{h['sender']}: {h['message']}" for h in chats[upto:]]
+        counts = [self.count_tokens(tokenizer, line) for line in lines]
+        summary_text = summary.get("text", "")
+        summary_tokens = self.count_tokens(tokenizer, summary_text) if summary_text else 0
+
+        if lines and summary_tokens + sum(counts) > self.token_budget:
+            # Fold until the recent turns take half the budget, so the next few turns fit without re-summarising
+            total = sum(counts)
+            fold = 0
+            while fold < len(lines) - 1 and total > self.token_budget // 2:
+                total -= counts[fold]
+                fold += 1
+            if fold:
+                summary_text = summarize(summary_text, lines[:fold])
+                summary["text"] = summary_text
+                summary["upto"] = upto + fold
+                summary_tokens = self.count_tokens(tokenizer, summary_text)
+                lines, counts = lines[fold:], counts[fold:]
+
+        # A single oversized turn can still overflow; drop from the oldest end, keeping the latest turn
+        total = summary_tokens + sum(counts)
+        while len(lines) > 1 and total > self.token_budget:
+            total -= counts.pop(0)
+            lines.pop(0)
+
+        parts = [f"Summary of the earlier conversation: {summary_text}"] if summary_text else []
+        return "\n".join(parts + lines)
+
+
+history_builder = HistoryBuilder(token_budget=HISTORY_TOKEN_BUDGET)
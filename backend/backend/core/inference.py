@@ -0,0 +1,126 @@
+import asyncio
+import functools
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from fastapi import HTTPException
+
+# Add the project's top-level directory to sys.path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "../..")))
+from config_model import INFERENCE_MAX_CONCURRENCY, INFERENCE_MAX_QUEUE, INFERENCE_TIMEOUT
+from core.metrics import QUEUE_WAIT_SECONDS
+from core.log import get_logger
+
+log = get_logger("inference")
+
+
+class InferenceExecutor:
+    """
+    Runs blocking model calls on dedicated worker threads behind an asyncio queue,
+    so generation never blocks the event loop serving the rest of the API.
+    """
+
+    def __init__(self, max_concurrency: int, max_queue: int, timeout: float):
+        self.max_concurrency = max_concurrency
+        self.max_queue = max_queue
+        self.timeout = timeout
+        self._queue = None
+        self._pool = None
+        self._workers = []
+        self._running = 0
+
+    async def start(self):
+        """Create the worker pool and the consumers draining the queue."""
+        self._queue = asyncio.Queue(maxsize=self.max_queue)
+        self._pool = ThreadPoolExecutor(max_workers=self.max_concurrency, thread_name_prefix="inference")
+        self._workers = [asyncio.create_task(self._worker()) for _ in range(self.max_concurrency)]
+        log.info("inference_executor_started", sampled=False, workers=self.max_concurrency)
+
+    async def stop(self):
+        """Stop accepting work and release the worker threads."""
+        for worker in self._workers:
+            worker.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+        if self._pool:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+        self._queue = None
+        log.info("inference_executor_stopped", sampled=False)
+
+    async def _worker(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            fn, future, queued_at = await self._queue.get()
+            QUEUE_WAIT_SECONDS.observe(time.perf_counter() - queued_at)
+            try:
+                # The caller gave up (timeout or disconnect) while the job was queued
+                if future.done():
+                    continue
+                self._running += 1
+                try:
+                    result = await loop.run_in_executor(self._pool, fn)
+                except Exception as e:
+                    if not future.done():
+                        future.set_exception(e)
+                else:
+                    if not future.done():
+                        future.set_result(result)
+                finally:
+                    self._running -= 1
+            finally:
+                self._queue.task_done()
+
+    def enqueue(self, fn, *args, **kwargs) -> asyncio.Future:
+        """
+        Queue fn(*args, **kwargs) without waiting for it and return the future of its result.
+        Raises 503 straight away when the queue is full.
+        """
+        if self._queue is None:
+            raise HTTPException(status_code=503, detail="Inference service is not running")
+
+        future = asyncio.get_running_loop().create_future()
+        try:
+            self._queue.put_nowait((functools.partial(fn, *args, **kwargs), future, time.perf_counter()))
+        except asyncio.QueueFull:
+            raise HTTPException(
+                status_code=503,
+                detail="Inference queue is full, please retry shortly",
+                headers={"Retry-After": "5"}
+            )
+        return future
+
+    async def submit(self, fn, *args, timeout: float = None, **kwargs):
+        """
+        Queue fn(*args, **kwargs) and wait for its result.
+        Raises 503 straight away when the queue is full and 504 when the request times out.
+        """
+        future = self.enqueue(fn, *args, **kwargs)
+        cancel_token = kwargs.get("cancel_token")
+        try:
+            return await asyncio.wait_for(future, timeout or self.timeout)
+        except asyncio.TimeoutError:
+            # Stop the generation thread too rather than letting it run on unobserved
+            if cancel_token is not None:
+                cancel_token.cancel("timeout")
+            raise HTTPException(status_code=504, detail="Timed out waiting for the model to respond")
+        except asyncio.CancelledError:
+            if cancel_token is not None:
+                cancel_token.cancel("disconnected")
+            raise
+
+    def stats(self) -> dict:
+        """Current queue depth and worker usage."""
+        return {
+            "queued": self._queue.qsize() if self._queue else 0,
+            "running": self._running,
+            "max_concurrency": self.max_concurrency,
+            "max_queue": self.max_queue,
+        }
+
+
+inference_executor = InferenceExecutor(
+    max_concurrency=INFERENCE_MAX_CONCURRENCY,
+    max_queue=INFERENCE_MAX_QUEUE,
+    timeout=INFERENCE_TIMEOUT
+)
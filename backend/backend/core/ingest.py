@@ -0,0 +1,61 @@
+import io
+import os
+import sys
+import numpy as np
+from PIL import Image
+
+# Add the project's top-level directory to sys.path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "../..")))
+from config_model import INGEST_THUMBNAIL_SIZE, INGEST_MODEL_MAX_SIDE
+from core.media_store import media_store, MediaStore
+
+
+class ImageIngest:
+    """
+    Derivatives of a stored image, keyed by its content hash: a JPEG thumbnail for display and an
+    RGB uint8 array already downscaled to the resolution the processor works at. Inference loads the
+    array instead of decoding the original, so tens-of-megapixel photos are decoded once, at upload.
+    """
+
+    def __init__(self, store: MediaStore, thumbnail_size: int, model_max_side: int):
+        self.store = store
+        self.thumbnail_size = thumbnail_size
+        self.model_max_side = model_max_side
+
+    def array_path(self, image_hash: str) -> str:
+        return self.store.derived_path(image_hash, "npy")
+
+    def thumbnail_path(self, image_hash: str) -> str:
+        return self.store.derived_path(image_hash, "thumb.jpg")
+
+    def ingested(self, image_hash: str) -> bool:
+        return os.path.exists(self.array_path(image_hash)) and os.path.exists(self.thumbnail_path(image_hash))
+
+    def decode(self, data: bytes) -> Image.Image:
+        """Decode to RGB at no more than model resolution. JPEGs are decoded at a reduced scale directly."""
+        img = Image.open(io.BytesIO(data))
+        img.draft("RGB", (self.model_max_side, self.model_max_side))
+        img = img.convert("RGB")
+        if max(img.size) > self.model_max_side:
+            img.thumbnail((self.model_max_side, self.model_max_side), Image.LANCZOS)
+        return img
+
+    def ingest(self, image_hash: str, data: bytes):
+        """Write the thumbnail and model-ready array of an image. Blocking; run off the event loop."""
+        if self.ingested(image_hash):
+            return
+        img = self.decode(data)
+        self.store.write_atomic(self.array_path(image_hash), lambda f: np.save(f, np.asarray(img)))
+        thumbnail = img.copy()
+        thumbnail.thumbnail((self.thumbnail_size, self.thumbnail_size))
+        self.store.write_atomic(self.thumbnail_path(image_hash), lambda f: thumbnail.save(f, "JPEG", quality=85))
+
+    def load(self, image_hash: str):
+        """The precomputed image, or None if it has not been ingested (yet)."""
+        try:
+            return Image.fromarray(np.load(self.array_path(image_hash)))
+        except (FileNotFoundError, ValueError):
+            return None
+
+
+image_ingest = ImageIngest(media_store, thumbnail_size=INGEST_THUMBNAIL_SIZE, model_max_side=INGEST_MODEL_MAX_SIDE)
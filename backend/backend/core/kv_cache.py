@@ -0,0 +1,100 @@
+import os
+import sys
+import threading
+from collections import OrderedDict
+import torch
+
+# Add the project's top-level directory to sys.path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "../..")))
+from config_model import PREFIX_CACHE_MAX_BYTES
+
+
+def cache_nbytes(cache) -> int:
+    """Memory held by the key/value tensors of a transformers Cache."""
+    if hasattr(cache, "layers"):
+        tensors = [t for layer in cache.layers for t in (layer.keys, layer.values) if t is not None]
+    else:
+        tensors = list(cache.key_cache) + list(cache.value_cache)
+    return sum(t.numel() * t.element_size() for t in tensors)
+
+
+def common_prefix_length(a: torch.Tensor, b: torch.Tensor) -> int:
+    """Number of leading tokens two 1-D id tensors share."""
+    n = min(a.shape[0], b.shape[0])
+    if n == 0:
+        return 0
+    mismatch = (a[:n] != b[:n]).nonzero()
+    return int(mismatch[0]) if len(mismatch) else n
+
+
+class PrefixCache:
+    """
+    Past key/values of the last prompt of each chat context, kept in LRU order
+    under a memory budget, so a new turn only prefills what changed since then.
+    """
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()  # context_id -> (prompt ids on cpu, cache, nbytes)
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def take(self, context_id: str, input_ids: torch.Tensor):
+        """
+        Remove and return the context's cache cropped to the prefix it shares with input_ids,
+        or None when there is nothing reusable (evicted, first turn, or history edited at the start).
+        """
+        with self._lock:
+            entry = self._entries.pop(context_id, None)
+            if entry:
+                self._bytes -= entry[2]
+        if entry is None:
+            self.misses += 1
+            return None
+
+        cached_ids, cache, _ = entry
+        # Always leave at least one token to prefill so generate has logits to start from
+        reusable = min(common_prefix_length(cached_ids, input_ids.cpu()), input_ids.shape[0] - 1)
+        if reusable <= 0:
+            self.misses += 1
+            return None
+        cache.crop(reusable)
+        self.hits += 1
+        return cache
+
+    def store(self, context_id: str, input_ids: torch.Tensor, cache):
+        """Keep the cache of this turn's prompt, dropping the generated tokens it also holds."""
+        cache.crop(input_ids.shape[0])
+        nbytes = cache_nbytes(cache)
+        if nbytes > self.max_bytes:
+            return
+        with self._lock:
+            old = self._entries.pop(context_id, None)
+            if old:
+                self._bytes -= old[2]
+            self._entries[context_id] = (input_ids.cpu(), cache, nbytes)
+            self._bytes += nbytes
+            while self._bytes > self.max_bytes:
+                _, (_, _, evicted) = self._entries.popitem(last=False)
+                self._bytes -= evicted
+
+    def drop(self, context_id: str):
+        """Forget a context, e.g. when it is deleted."""
+        with self._lock:
+            entry = self._entries.pop(context_id, None)
+            if entry:
+                self._bytes -= entry[2]
+
+    def stats(self) -> dict:
+        return {
+            "entries": len(self._entries),
+            "bytes": self._bytes,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+        }
+
+
+prefix_cache = PrefixCache(max_bytes=PREFIX_CACHE_MAX_BYTES)
@@ -0,0 +1,46 @@
+import json
+import logging
+import os
+import random
+import sys
+
+# Add the project's top-level directory to sys.path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "../..")))
+from config_model import LOG_LEVEL, LOG_SAMPLE_RATE
+
+_handler = logging.StreamHandler()
+_handler.setFormatter(logging.Formatter("%(asctime)s %(levelname)s %(name)s %(message)s"))
+_root = logging.getLogger("shakti")
+_root.addHandler(_handler)
+_root.setLevel(LOG_LEVEL)
+_root.propagate = False
+
+
+class StructuredLogger:
+    """
+    Writes one JSON object per event. Routine info events are sampled at LOG_SAMPLE_RATE
+    so busy workers don't flood the log; warnings and errors are always written.
+    """
+
+    def __init__(self, name: str, sample_rate: float):
+        self.logger = logging.getLogger(f"shakti.{name}")
+        self.sample_rate = sample_rate
+
+    def _write(self, level: int, event: str, fields: dict):
+        if self.logger.isEnabledFor(level):
+            self.logger.log(level, json.dumps({"event": event, **fields}, default=str))
+
+    def info(self, event: str, sampled: bool = True, **fields):
+        if sampled and random.random() >= self.sample_rate:
+            return
+        self._write(logging.INFO, event, fields)
+
+    def warning(self, event: str, **fields):
+        self._write(logging.WARNING, event, fields)
+
+    def error(self, event: str, **fields):
+        self._write(logging.ERROR, event, fields)
+
+
+def get_logger(name: str) -> StructuredLogger:
+    return StructuredLogger(name, LOG_SAMPLE_RATE)
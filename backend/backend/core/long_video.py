@@ -0,0 +1,125 @@
+import asyncio
+import math
+import os
+import sys
+
+# Add the project's top-level directory to sys.path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "../..")))
+from config_model import (
+    LONG_VIDEO_ENABLED, LONG_VIDEO_MIN_SECONDS, LONG_VIDEO_SEGMENT_SECONDS, LONG_VIDEO_MAX_SEGMENTS,
+    LONG_VIDEO_MAX_PARALLEL, INFERENCE_MAX_CONCURRENCY
+)
+from core.inference import inference_executor
+from core.media_store import media_store
+from core.model import video_duration
+from core.log import get_logger
+
+log = get_logger("long_video")
+
+# Time past the deadline allowed for a generation to notice it and return what it has
+STOP_GRACE_SECONDS = 30
+
+SEGMENT_PROMPT = (
+    "This clip is the part of a longer recording from {start} to {end}. "
+    "Describe what happens in it that is relevant to the question below, with approximate times. "
+    "Say so briefly if nothing relevant happens.\n{query}"
+)
+MERGE_PROMPT = (
+    "A recording was analysed in consecutive segments. The findings for each segment follow, "
+    "labelled with its time range.\n\n{findings}\n\n"
+    "Using only these findings, answer the question below for the whole recording and cite the "
+    "time ranges your answer relies on.\n{query}"
+)
+
+
+def format_timestamp(seconds: float) -> str:
+    seconds = int(seconds)
+    return f"{seconds // 3600}:{seconds // 60 % 60:02d}:{seconds % 60:02d}"
+
+
+def submit_timeout(cancel_token) -> float:
+    """Executor timeout for one call of the run: the run's own deadline, not INFERENCE_TIMEOUT."""
+    return (cancel_token.remaining() or 0) + STOP_GRACE_SECONDS
+
+
+def split_segments(duration: float) -> list:
+    """(start, end) seconds of equal segments of about LONG_VIDEO_SEGMENT_SECONDS covering the clip."""
+    count = max(1, min(LONG_VIDEO_MAX_SEGMENTS, math.ceil(duration / LONG_VIDEO_SEGMENT_SECONDS)))
+    length = duration / count
+    return [(round(i * length, 1), round(min(duration, (i + 1) * length), 1)) for i in range(count)]
+
+
+def long_video_duration(kwargs: dict):
+    """
+    Duration of the request's video if it should run in long-video mode, else None.
+    That is a single video with no other media, at least LONG_VIDEO_MIN_SECONDS long. Blocking.
+    """
+    videos = kwargs.get("video_files") or []
+    if not LONG_VIDEO_ENABLED or len(videos) != 1 or kwargs.get("image_files") or kwargs.get("pdf_files"):
+        return None
+    video = videos[0]
+    if not isinstance(video, (bytes, bytearray, memoryview)):
+        video = media_store.resolve("videos", video)
+    try:
+        duration = video_duration(video)
+    except Exception as e:
+        # analyze() reports unreadable videos itself
+        log.warning("video_probe_failed", error=str(e))
+        return None
+    return duration if duration >= LONG_VIDEO_MIN_SECONDS else None
+
+
+async def analyze_long_video(fn, duration: float, cancel_token, query=None, video_files=None,
+                             history=None, summary=None, context_id=None, content_hashes=None, **kwargs):
+    """
+    Map-reduce answer about a long video: every segment is sampled with the usual frame budget and
+    analysed through the inference executor, up to LONG_VIDEO_MAX_PARALLEL at a time (each on its own
+    worker, so never more than INFERENCE_MAX_CONCURRENCY), then a text-only pass merges the timestamped findings (with the chat history) into one answer.
+    fn is analyze() or its model-server proxy.
+    """
+    segments = split_segments(duration)
+    slots = asyncio.Semaphore(max(1, min(LONG_VIDEO_MAX_PARALLEL, INFERENCE_MAX_CONCURRENCY)))
+    question = query or "Describe what happens in the recording."
+
+    async def analyze_segment(segment):
+        start, end = segment
+        async with slots:
+            if cancel_token.should_stop():
+                return None
+            return await inference_executor.submit(
+                fn,
+                query=SEGMENT_PROMPT.format(start=format_timestamp(start), end=format_timestamp(end), query=question),
+                video_files=video_files,
+                video_segment=[start, end],
+                # Otherwise an in-memory video would be hashed again for every segment
+                content_hashes=content_hashes,
+                cancel_token=cancel_token,
+                timeout=submit_timeout(cancel_token),
+            )
+
+    log.info("long_video_start", duration=round(duration, 1), segments=len(segments))
+    tasks = [asyncio.create_task(analyze_segment(segment)) for segment in segments]
+    try:
+        results = await asyncio.gather(*tasks)
+    except BaseException:
+        # One segment failed (503 full queue, 504 timeout) or the request was cancelled: stop the rest
+        cancel_token.cancel("error")
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        raise
+    findings = "\n\n".join(
+        f"[{format_timestamp(start)} - {format_timestamp(end)}] {result.strip()}"
+        for (start, end), result in zip(segments, results) if result
+    )
+    if not findings:
+        return None
+    return await inference_executor.submit(
+        fn,
+        query=MERGE_PROMPT.format(findings=findings, query=question),
+        history=history or [],
+        summary=summary,
+        context_id=context_id,
+        cancel_token=cancel_token,
+        timeout=submit_timeout(cancel_token),
+    )
@@ -0,0 +1,134 @@
+import hashlib
+import mimetypes
+import os
+import re
+import sys
+import tempfile
+from io import BytesIO
+from PIL import Image
+from starlette.staticfiles import StaticFiles
+
+# Add the project's top-level directory to sys.path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "../..")))
+from config_model import BASE_DIR, MEDIA_STORE_DIR
+
+# Names handed out by the store: the content hash plus the original extension
+STORED_NAME = re.compile(r"^([0-9a-f]{64})\.([a-z0-9]{1,8})$")
+# PIL format -> file extension, so images keep the encoding they were uploaded in
+IMAGE_EXTENSIONS = {"JPEG": "jpg", "PNG": "png", "WEBP": "webp", "GIF": "gif", "BMP": "bmp", "TIFF": "tiff"}
+# Media type (or its prefix) a stored name must have to be served from each mount
+MOUNT_MEDIA_TYPES = {"images": "image/", "videos": "video/", "pdfs": "application/pdf"}
+
+
+def image_extension(data: bytes) -> str:
+    """Extension of the encoded image; raises if the bytes are not an image PIL can read."""
+    image_format = Image.open(BytesIO(data)).format
+    return IMAGE_EXTENSIONS.get(image_format, (image_format or "bin").lower())
+
+
+class MediaStore:
+    """
+    Stores each distinct upload once, named by its SHA-256 and original extension
+    (media/ab/abcd....jpg). Chats reference media by that name, so uploading the same
+    file again is a hash lookup instead of a decode and a write. Files saved under the
+    old timestamp names in images/, videos/ and pdfs/ still resolve through resolve().
+    """
+
+    def __init__(self, root: str, legacy_root: str):
+        self.root = root
+        self.legacy_root = legacy_root
+        self.tmp_dir = os.path.join(root, "tmp")
+        self.derived_dir = os.path.join(root, "derived")
+
+    def start(self):
+        os.makedirs(self.tmp_dir, exist_ok=True)
+        os.makedirs(self.derived_dir, exist_ok=True)
+
+    def name_for(self, data: bytes, extension: str) -> str:
+        return f"{hashlib.sha256(data).hexdigest()}.{extension}"
+
+    def blob_path(self, name: str):
+        """Path of a stored name, or None if name is not a content-addressed name."""
+        match = STORED_NAME.match(name)
+        if not match:
+            return None
+        return os.path.join(self.root, match.group(1)[:2], name)
+
+    def resolve(self, kind: str, name: str) -> str:
+        """File behind a chat media reference: the store for hashed names, the legacy folder otherwise."""
+        name = os.path.basename(str(name))
+        return self.blob_path(name) or os.path.join(self.legacy_root, kind, name)
+
+    def derived_path(self, content_hash: str, suffix: str) -> str:
+        """Path of a file generated from a stored upload, such as its thumbnail."""
+        return os.path.join(self.derived_dir, content_hash[:2], f"{content_hash}.{suffix}")
+
+    def exists(self, name: str) -> bool:
+        path = self.blob_path(name)
+        return path is not None and os.path.exists(path)
+
+    def put(self, name: str, data: bytes):
+        """Write data under name unless it is already stored. Blocking; run off the event loop."""
+        path = self.blob_path(name)
+        if os.path.exists(path):
+            return
+        self.write_atomic(path, lambda f: f.write(data))
+
+    def write_atomic(self, path: str, write):
+        """Create path by calling write(file) on a temp file and renaming it into place,
+        so a concurrent reader never sees half a file."""
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with tempfile.NamedTemporaryFile(dir=self.tmp_dir, delete=False) as f:
+            write(f)
+        os.replace(f.name, path)
+
+    def adopt(self, temp_path: str, name: str):
+        """Move a file already streamed into tmp_dir into the store, or drop it if it is a duplicate."""
+        path = self.blob_path(name)
+        if os.path.exists(path):
+            os.remove(temp_path)
+            return
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        os.replace(temp_path, path)
+
+    @staticmethod
+    def content_hash(name: str):
+        """SHA-256 encoded in a stored name, or None for legacy names."""
+        match = STORED_NAME.match(os.path.basename(str(name)))
+        return match.group(1) if match else None
+
+
+class MediaFiles(StaticFiles):
+    """
+    Static mount for /images, /videos and /pdfs that serves stored names from the media store.
+    The store holds every kind, so only names whose extension matches the mount's kind are looked up
+    there. With derived set, a stored name is served as that derivative instead (/thumbnails/<name>).
+    """
+
+    def __init__(self, store: MediaStore, kind: str, derived: str = None, **kwargs):
+        super().__init__(**kwargs)
+        self.store = store
+        self.kind = kind
+        self.derived = derived
+
+    def serves(self, name: str) -> bool:
+        media_type = mimetypes.guess_type(name)[0] or ""
+        return media_type.startswith(MOUNT_MEDIA_TYPES[self.kind])
+
+    def lookup_path(self, path: str):
+        name = os.path.basename(path)
+        blob = self.store.blob_path(name) if self.serves(name) else None
+        if blob and self.derived:
+            blob = self.store.derived_path(self.store.content_hash(name), self.derived)
+        if blob:
+            try:
+                return blob, os.stat(blob)
+            except FileNotFoundError:
+                pass
+        if self.derived:
+            # Derivatives exist only for stored names; nothing else in the directory is served
+            return "", None
+        return super().lookup_path(path)
+
+
+media_store = MediaStore(root=MEDIA_STORE_DIR, legacy_root=os.path.join(BASE_DIR, "backend"))
@@ -0,0 +1,119 @@
+import time
+from contextlib import contextmanager
+import torch
+from prometheus_client import Counter, Histogram, REGISTRY
+from prometheus_client.core import CounterMetricFamily
+from transformers import StoppingCriteria
+
+# Seconds; spans a base64 decode of a small image up to a long video generation
+STAGE_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+
+STAGE_SECONDS = Histogram(
+    "shakti_stage_seconds",
+    "Time spent in each stage of a chat turn",
+    ["stage"],
+    buckets=STAGE_BUCKETS
+)
+QUEUE_WAIT_SECONDS = Histogram(
+    "shakti_queue_wait_seconds",
+    "Time a request waited in the inference queue before a worker picked it up",
+    buckets=STAGE_BUCKETS
+)
+TOKENS_GENERATED = Counter("shakti_tokens_generated_total", "Tokens generated by the model")
+TOKENS_PER_SECOND = Histogram(
+    "shakti_tokens_per_second",
+    "Decode throughput of each generate call",
+    buckets=(1, 2, 5, 10, 20, 50, 100, 200, 500)
+)
+# The answer cache lives in Redis, so its lookups are counted here per worker
+ANSWER_CACHE_LOOKUPS = Counter("shakti_answer_cache_lookups_total", "Answer cache lookups", ["result"])
+BACKGROUND_WRITE_FAILURES = Counter(
+    "shakti_background_write_failures_total",
+    "Media and chat writes that failed after the request had been answered",
+    ["op"]
+)
+VISION_TOKENS_SAVED = Counter(
+    "shakti_vision_tokens_saved_total",
+    "Estimated vision-encoder tokens avoided by dropping near-duplicate video frames and PDF images",
+    ["source"]
+)
+
+
+@contextmanager
+def timed(stage: str):
+    """Observe the duration of the enclosed block under the given stage label."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        STAGE_SECONDS.labels(stage=stage).observe(time.perf_counter() - start)
+
+
+class GenerationTimer(StoppingCriteria):
+    """
+    Never stops generation; it only notes when the first token came out, which splits a
+    generate call into prefill and decode, and how many tokens were produced. Rows of a batch
+    that finish early are filled with pad_token_id, which is not counted.
+    """
+
+    def __init__(self, prompt_length: int, pad_token_id: int = None):
+        self.prompt_length = prompt_length
+        self.pad_token_id = pad_token_id
+        self.start = time.perf_counter()
+        self.first_token = None
+        self.input_ids = None
+
+    def __call__(self, input_ids, scores, **kwargs):
+        if self.first_token is None:
+            self.first_token = time.perf_counter()
+        self.input_ids = input_ids
+        return torch.zeros(input_ids.shape[0], dtype=torch.bool, device=input_ids.device)
+
+    def generated_tokens(self) -> int:
+        new_tokens = self.input_ids[:, self.prompt_length:]
+        if self.pad_token_id is None or self.input_ids.shape[0] == 1:
+            return new_tokens.numel()
+        return int((new_tokens != self.pad_token_id).sum())
+
+    def observe(self):
+        """Record prefill, decode, token count and throughput once generate has returned."""
+        end = time.perf_counter()
+        if self.first_token is None:
+            return
+        STAGE_SECONDS.labels(stage="prefill").observe(self.first_token - self.start)
+        STAGE_SECONDS.labels(stage="decode").observe(end - self.first_token)
+        tokens = self.generated_tokens()
+        TOKENS_GENERATED.inc(tokens)
+        if end > self.start:
+            TOKENS_PER_SECOND.observe(tokens / (end - self.start))
+
+
+class CacheStatsCollector:
+    """Exports the hit/miss counters the in-process caches already keep in their stats()."""
+
+    def collect(self):
+        # Imported here so this module stays importable before the caches are
+        from core.kv_cache import prefix_cache
+        from core.vision_cache import vision_cache
+        from core.frame_cache import frame_cache
+        from core.pdf_extract import pdf_extractor
+
+        family = CounterMetricFamily("shakti_cache_lookups", "Lookups of the in-process caches", labels=["cache", "result"])
+        prefix = prefix_cache.stats()
+        family.add_metric(["prefix", "hit"], prefix["hits"])
+        family.add_metric(["prefix", "miss"], prefix["misses"])
+        vision = vision_cache.stats()
+        family.add_metric(["image", "hit"], vision["image_hits"])
+        family.add_metric(["image", "miss"], vision["image_misses"])
+        family.add_metric(["vision_features", "hit"], vision["feature_hits"] + vision["feature_disk_hits"])
+        family.add_metric(["vision_features", "miss"], vision["feature_misses"])
+        frames = frame_cache.stats()
+        family.add_metric(["video_frames", "hit"], frames["hits"])
+        family.add_metric(["video_frames", "miss"], frames["misses"])
+        pdf = pdf_extractor.stats()
+        family.add_metric(["pdf_pages", "hit"], pdf["page_hits"])
+        family.add_metric(["pdf_pages", "miss"], pdf["page_misses"])
+        yield family
+
+
+REGISTRY.register(CacheStatsCollector())
@@ -1,145 +1,254 @@
 import os
 import sys
 import io
+import bisect
+import math
+import numpy as np
 import torch
 from PIL import Image
-from transformers import AutoTokenizer
-import importlib.util
+from transformers import DynamicCache, StoppingCriteriaList
 from decord import VideoReader, cpu
-import fitz  # PyMuPDF for PDF processing
 from pathlib import Path
 # Add the project's top-level directory to sys.path
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "../..")))
-from config_model import BASE_DIR, COMPUTE_TYPE, MODE
+from config_model import (
+    BATCHING_ENABLED, PREFIX_CACHE_ENABLED, HISTORY_SUMMARY_MAX_TOKENS,
+    PROMPT_LOOKUP_ENABLED, PROMPT_LOOKUP_NUM_TOKENS, PROMPT_LOOKUP_MAX_NGRAM, COMPILE_ENABLED,
+    VIDEO_DECODE_THREADS, VIDEO_FRAME_SHORT_SIDE, VIDEO_SNAP_TO_KEYFRAMES,
+    VISION_DEDUP_ENABLED, VISION_DEDUP_MAX_DISTANCE, VIDEO_CANDIDATE_FACTOR, VISION_TOKENS_PER_IMAGE
+)
+from core.model_manager import DEVICE, load_model, model_manager
+from core.batching import batch_scheduler, is_text_only
+from core.kv_cache import prefix_cache
+from core.history import history_builder
+from core.vision_cache import vision_cache, sha256_bytes, tag_media
+from core.media_store import media_store
+from core.ingest import image_ingest
+from core.frame_cache import frame_cache
+from core.pdf_extract import pdf_extractor
+from core.cancellation import CancellationCriteria
+from core.compilation import pad_to_bucket
+from core.metrics import timed, GenerationTimer, VISION_TOKENS_SAVED
+from core.frame_select import select_frames, distinct_images
+from core.log import get_logger
+
+log = get_logger("model")
 
 MAX_NUM_FRAMES = 16
 
-# Set the device based on configuration
-DEVICE = torch.device("cuda" if (COMPUTE_TYPE == "gpu" and torch.cuda.is_available()) else "cpu")
-print(f"Using device: {DEVICE}")
-if COMPUTE_TYPE == "gpu" and torch.cuda.is_available():
-    print(f"CUDA version: {torch.version.cuda}")
-
-# Function to dynamically load the model and tokenizer
-def load_model(model_dir):
-    sys.path.append(model_dir)
-
-    config_module_path = os.path.join(model_dir, "configuration_shakti.py")
-    model_module_path = os.path.join(model_dir, "modeling_shakti.py")
-
-    spec_config = importlib.util.spec_from_file_location("shaktiConfig", config_module_path)
-    if spec_config is None or spec_config.loader is None:
-        raise ImportError(f"Failed to load configuration module from {config_module_path}")
-    config_module = importlib.util.module_from_spec(spec_config)
-    sys.modules["shaktiConfig"] = config_module
-    spec_config.loader.exec_module(config_module)
-
-    spec_model = importlib.util.spec_from_file_location("shaktiModel", model_module_path)
-    if spec_model is None or spec_model.loader is None:
-        raise ImportError(f"Failed to load model module from {model_module_path}")
-    model_module = importlib.util.module_from_spec(spec_model)
-    sys.modules["shaktiModel"] = model_module
-    spec_model.loader.exec_module(model_module)
-
-    from shaktiConfig import shaktiConfig
-    from shaktiModel import shaktiModel
-
-    config = shaktiConfig.from_pretrained(model_dir)
-    model = shaktiModel.from_pretrained(
-        model_dir,
-        config=config,
-        attn_implementation='sdpa',
-        torch_dtype=torch.float16 if DEVICE.type == "cuda" else torch.float32
-    )
-    model.eval().to(DEVICE)
-
-    tokenizer = AutoTokenizer.from_pretrained(model_dir)
-    processor = model.init_processor(tokenizer)
-
-    return model, tokenizer, processor
-
-model_dir = os.path.join(BASE_DIR, "shakti-2B-041224")
-if MODE == "model":
-    model, tokenizer, processor = load_model(model_dir)
-else:
-    print("Running without model.")
-print("Model and tokenizer loaded successfully.")
-
-# Function to encode video into frames
-def encode_video(video_path):
-    def uniform_sample(l, n):
-        gap = len(l) / n
-        idxs = [int(i * gap + gap / 2) for i in range(n)]
-        return [l[i] for i in idxs]
-
-    vr = VideoReader(video_path, ctx=cpu(0))
-    sample_fps = round(vr.get_avg_fps() / 1)
-    frame_idx = [i for i in range(0, len(vr), sample_fps)]
-    if len(frame_idx) > MAX_NUM_FRAMES:
-        frame_idx = uniform_sample(frame_idx, MAX_NUM_FRAMES)
-    frames = vr.get_batch(frame_idx).asnumpy()
-    frames = [Image.fromarray(v.astype('uint8')) for v in frames]
-    print(f"Encoded {len(frames)} frames from video: {video_path}")
-    return frames
+def sample_indices(num_frames: int, fps: float, max_frames: int = MAX_NUM_FRAMES) -> list:
+    """One frame per second of video, spread uniformly over max_frames when the clip is longer."""
+    step = max(1, round(fps))
+    seconds = -(-num_frames // step)
+    if seconds <= max_frames:
+        return [i * step for i in range(seconds)]
+    gap = seconds / max_frames
+    return [int(i * gap + gap / 2) * step for i in range(max_frames)]
 
-# Function to process PDFs
-def process_pdf(pdf_path):
-    processed_images = []
-    extracted_text = ""
 
-    with fitz.open(pdf_path) as pdf:
-        for page_num in range(len(pdf)):
-            page = pdf[page_num]
+def snap_to_keyframes(indices: list, key_indices: list) -> list:
+    """
+    Move each sample to the nearest keyframe when it is less than half the sample spacing away.
+    A keyframe decodes on its own, while any other frame means decoding forward from the previous one.
+    """
+    if len(indices) < 2 or not key_indices:
+        return indices
+    tolerance = (indices[1] - indices[0]) / 2
+    snapped = []
+    for target in indices:
+        pos = bisect.bisect_left(key_indices, target)
+        nearest = min(key_indices[max(pos - 1, 0):pos + 1], key=lambda k: abs(k - target))
+        snapped.append(nearest if abs(nearest - target) < tolerance else target)
+    return snapped
 
-            # Extract text
-            extracted_text += page.get_text()
 
-            # Extract images
-            for img_index, img in enumerate(page.get_images(full=True)):
-                xref = img[0]
-                base_image = pdf.extract_image(xref)
-                image_bytes = base_image["image"]
-                img = Image.open(io.BytesIO(image_bytes)).convert("RGB")
-                processed_images.append(img)
+def decoded_size(height: int, width: int, short_side: int = VIDEO_FRAME_SHORT_SIDE):
+    """(width, height) to decode at: shorter side down to short_side, even dimensions for the scaler."""
+    scale = min(1.0, short_side / min(height, width))
+    return max(2, int(width * scale) // 2 * 2), max(2, int(height * scale) // 2 * 2)
+
+
+def video_candidate_frames() -> int:
+    """Frames encode_video samples: the budget, or a multiple of it for frame selection to choose from."""
+    return MAX_NUM_FRAMES * VIDEO_CANDIDATE_FACTOR if VISION_DEDUP_ENABLED else MAX_NUM_FRAMES
+
+
+def video_sampling_key(segment=None) -> str:
+    """The sampling settings encode_video runs with, as part of frame and feature cache keys."""
+    key = f"{video_candidate_frames()}f{VIDEO_FRAME_SHORT_SIDE}{'k' if VIDEO_SNAP_TO_KEYFRAMES else 'e'}"
+    if segment:
+        key += f"_{segment[0]:g}-{segment[1]:g}s"
+    return key
+
+
+def open_video(video, **kwargs) -> VideoReader:
+    source = io.BytesIO(video) if isinstance(video, (bytes, bytearray, memoryview)) else video
+    return VideoReader(source, ctx=cpu(0), num_threads=VIDEO_DECODE_THREADS, **kwargs)
+
 
-    print(f"Processed PDF: {pdf_path} with {len(processed_images)} images extracted.")
+def video_duration(video) -> float:
+    """Length of a clip in seconds, read from the container without decoding frames."""
+    vr = open_video(video)
+    return len(vr) / (vr.get_avg_fps() or 1)
+
+
+# Function to encode video into frames; video is a file path or the raw bytes of the clip
+def encode_video(video, segment=None) -> np.ndarray:
+    """
+    Sampled frames of a clip as a uint8 array of shape (frames, height, width, 3).
+    The sample positions are computed up front, so only those frames are decoded, and the
+    decoder scales them to model resolution while decoding.
+    segment=(start, end) in seconds samples only that part of the clip.
+    """
+    # The first pass only reads the container index; frame 0 gives the native size
+    vr = open_video(video)
+    num_frames, fps = len(vr), vr.get_avg_fps()
+    first = 0
+    if segment:
+        first = min(num_frames - 1, int(segment[0] * fps))
+        num_frames = max(1, min(num_frames, math.ceil(segment[1] * fps)) - first)
+    frame_idx = [first + i for i in sample_indices(num_frames, fps, video_candidate_frames())]
+    if VIDEO_SNAP_TO_KEYFRAMES:
+        try:
+            frame_idx = snap_to_keyframes(frame_idx, list(vr.get_key_indices()))
+        except Exception:
+            # Some containers have no keyframe index; sample the exact frames then
+            pass
+    height, width = vr[0].shape[:2]
+    del vr
+    target_width, target_height = decoded_size(height, width)
+    if (target_width, target_height) != (width, height):
+        vr = open_video(video, width=target_width, height=target_height)
+    else:
+        vr = open_video(video)
+    frames = vr.get_batch(frame_idx).asnumpy().astype(np.uint8, copy=False)
+    log.info("video_encoded", video=video if isinstance(video, str) else "<memory>", frames=len(frames), size=f"{target_width}x{target_height}")
+    return frames
+
+# Function to process PDFs; pdf is a file path or the raw bytes of the document
+def process_pdf(pdf, doc_hash=None, pages=None):
+    """
+    Images and text of a PDF, from the per-page extraction cache where possible.
+    pages=(first, last) limits the 1-based page range; PDF_MAX_PAGES applies either way.
+    """
+    processed_images, extracted_text = pdf_extractor.extract(pdf, doc_hash=doc_hash, pages=pages)
+    log.info("pdf_processed", pdf=pdf if isinstance(pdf, str) else "<memory>", images=len(processed_images), text_chars=len(extracted_text))
     return processed_images, extracted_text
 
+def known_hash(content_hashes, key: str, index: int):
+    """SHA-256 the caller already has for the index-th file of key (e.g. "video_files"), or None."""
+    hashes = (content_hashes or {}).get(key) or []
+    return hashes[index] if index < len(hashes) else None
+
 # Helper function for processing inputs
-def process_inputs_with_model(model, processor, tokenizer, query, images=None, videos=None, pdfs=None):
-    print("Processing inputs...")
+def process_inputs_with_model(model, processor, tokenizer, query, images=None, videos=None, pdfs=None, max_new_tokens=500, streamer=None, context_id=None, cancel_token=None, video_segment=None, pdf_pages=None, content_hashes=None):
+    """
+    content_hashes maps "image_files", "video_files" and "pdf_files" to the SHA-256 of each file, when
+    the caller computed it on upload, so in-memory media is not hashed again.
+    """
+    if cancel_token is not None and cancel_token.should_stop():
+        return ""
 
     # Prepare images
     processed_images = []
+    image_hashes = []
     if images:
-        for image_file in images:
-            path = os.path.join(BASE_DIR, "backend", "images", image_file)
-            if not os.path.exists(path):
-                raise FileNotFoundError(f"Image file {path} not found.")
-            img = Image.open(path).convert("RGB")
+        for index, image_file in enumerate(images):
+            if isinstance(image_file, Image.Image):
+                # Already decoded by the caller
+                img = image_file.convert("RGB")
+                processed_images.append(img)
+                image_hashes.append(sha256_bytes(img.tobytes()))
+                continue
+            path = None
+            if isinstance(image_file, (bytes, bytearray, memoryview)):
+                # Raw image bytes, handed over in memory by the chat routes or forwarded to the model server
+                image_bytes = bytes(image_file)
+                image_hash = known_hash(content_hashes, "image_files", index) or sha256_bytes(image_bytes)
+            else:
+                path = media_store.resolve("images", image_file)
+                if not os.path.exists(path):
+                    raise FileNotFoundError(f"Image file {path} not found.")
+                image_bytes = None
+                # Stored names carry the hash, so an ingested image is never read; legacy names are hashed
+                image_hash = media_store.content_hash(image_file)
+                if image_hash is None:
+                    with timed("image_read"), open(path, "rb") as f:
+                        image_bytes = f.read()
+                    image_hash = sha256_bytes(image_bytes)
+            # Re-uploads of the same image skip decoding and, further down, the vision encoder
+            img = vision_cache.get_image(image_hash)
+            if img is None:
+                with timed("image_load"):
+                    img = image_ingest.load(image_hash)
+                if img is None:
+                    # Not ingested yet (or ingest is off): decode here, still no larger than model resolution
+                    if image_bytes is None:
+                        with timed("image_read"), open(path, "rb") as f:
+                            image_bytes = f.read()
+                    with timed("image_decode"):
+                        img = image_ingest.decode(image_bytes)
+                vision_cache.put_image(image_hash, img)
             processed_images.append(img)
+            image_hashes.append(image_hash)
 
     # Prepare videos
     processed_videos = []
+    video_keys = []
+    # Frames and images dropped as near-duplicates, against what would have been sent without the filter
+    vision_inputs_saved = {"video": 0, "pdf": 0}
     if videos:
-        for video_file in videos:
-            path = os.path.join(BASE_DIR, "backend", "videos", video_file)
-            if not os.path.exists(path):
-                raise FileNotFoundError(f"Video file {path} not found.")
-            frames = encode_video(path)
-            processed_videos.append(frames)
+        for index, video_file in enumerate(videos):
+            if isinstance(video_file, (bytes, bytearray, memoryview)):
+                source = video_file
+                video_hash = known_hash(content_hashes, "video_files", index) or sha256_bytes(video_file)
+            else:
+                source = media_store.resolve("videos", video_file)
+                if not os.path.exists(source):
+                    raise FileNotFoundError(f"Video file {source} not found.")
+                # Legacy names are not hashed; hashing a long clip would cost about as much as sampling it
+                video_hash = media_store.content_hash(video_file)
+            # Follow-up questions about the same video load its frames instead of decoding it again
+            sampling = video_sampling_key(video_segment)
+            frames = frame_cache.get(video_hash, sampling) if video_hash else None
+            if frames is None:
+                with timed("video_decode"):
+                    frames = encode_video(source, video_segment)
+                if video_hash:
+                    frame_cache.put(video_hash, sampling, frames)
+            if VISION_DEDUP_ENABLED:
+                # Skip repeated frames; static footage ends up with fewer frames
+                keep = select_frames(frames, MAX_NUM_FRAMES, VISION_DEDUP_MAX_DISTANCE)
+                vision_inputs_saved["video"] += min(MAX_NUM_FRAMES, len(frames)) - len(keep)
+                frames = frames[keep]
+                # "u": the kept frames are subsampled uniformly, not ranked by change as before
+                sampling += f"d{VISION_DEDUP_MAX_DISTANCE}u"
+            processed_videos.append([Image.fromarray(frame) for frame in frames])
+            video_keys.append(f"{video_hash}.{sampling}" if video_hash else None)
 
     # Prepare PDFs
     processed_pdf_images = []
     pdf_text = ""
     if pdfs:
-        for pdf_file in pdfs:
-            path = os.path.join(BASE_DIR, "backend", "pdfs", pdf_file)
-            if not os.path.exists(path):
-                raise FileNotFoundError(f"PDF file {path} not found.")
-            pdf_images, pdf_extracted_text = process_pdf(path)
+        for index, pdf_file in enumerate(pdfs):
+            doc_hash = None
+            if isinstance(pdf_file, (bytes, bytearray, memoryview)):
+                source = pdf_file
+                doc_hash = known_hash(content_hashes, "pdf_files", index)
+            else:
+                source = media_store.resolve("pdfs", pdf_file)
+                if not os.path.exists(source):
+                    raise FileNotFoundError(f"PDF file {source} not found.")
+                doc_hash = media_store.content_hash(pdf_file)
+            with timed("pdf_extract"):
+                pdf_images, pdf_extracted_text = process_pdf(source, doc_hash, pdf_pages)
             processed_pdf_images += pdf_images
             pdf_text += pdf_extracted_text
+        if VISION_DEDUP_ENABLED and processed_pdf_images:
+            # Repeated scans, logos and letterheads are encoded once
+            keep = distinct_images(processed_pdf_images, VISION_DEDUP_MAX_DISTANCE)
+            vision_inputs_saved["pdf"] = len(processed_pdf_images) - len(keep)
+            processed_pdf_images = [processed_pdf_images[i] for i in keep]
 
     # Prepare messages
     tokens = ""
@@ -153,35 +262,94 @@ def process_inputs_with_model(model, processor, tokenizer, query, images=None, v
         {"role": "assistant", "content": ""}
     ]
 
-    inputs = processor(
-        messages,
-        images=processed_images + processed_pdf_images if processed_images or processed_pdf_images else None,
-        videos=processed_videos if processed_videos else None
+    with timed("processor"):
+        inputs = processor(
+            messages,
+            images=processed_images + processed_pdf_images if processed_images or processed_pdf_images else None,
+            videos=processed_videos if processed_videos else None
+        )
+        inputs = inputs.to(DEVICE)
+    # Encoder outputs are cached by the content of every image and video frame behind pixel_values
+    media_keys = image_hashes + video_keys
+    if media_keys and None not in media_keys and not processed_pdf_images and inputs.get("pixel_values") is not None:
+        tag_media(inputs["pixel_values"], media_keys)
+
+    # Text turns of a known context reuse the key/values of the previous prompt instead of re-prefilling history
+    use_prefix_cache = PREFIX_CACHE_ENABLED and context_id is not None and is_text_only(inputs)
+    # Answers about a PDF copy long spans of its text, so drafts looked up in the prompt are often accepted
+    use_prompt_lookup = PROMPT_LOOKUP_ENABLED and bool(pdf_text.strip())
+    if COMPILE_ENABLED and not use_prefix_cache:
+        # Keep prefill shapes to the buckets compiled at startup; cached prefixes must keep their exact tokens
+        pad_token_id = tokenizer.pad_token_id if tokenizer.pad_token_id is not None else tokenizer.eos_token_id
+        inputs = pad_to_bucket(inputs, pad_token_id)
+
+    vision_tokens_saved = 0
+    for source, saved in vision_inputs_saved.items():
+        if saved:
+            VISION_TOKENS_SAVED.labels(source=source).inc(saved * VISION_TOKENS_PER_IMAGE)
+            vision_tokens_saved += saved * VISION_TOKENS_PER_IMAGE
+    log.info("generate_start", prompt_tokens=inputs['input_ids'].shape[-1], images=len(processed_images) + len(processed_pdf_images), videos=len(processed_videos), vision_tokens_saved=vision_tokens_saved)
+    if BATCHING_ENABLED and streamer is None and not use_prefix_cache and not use_prompt_lookup and is_text_only(inputs):
+        # Concurrent text chats are merged into one batched generate by the scheduler. Media prompts can't
+        # be collated, so they generate on their own executor thread instead of queueing behind one another
+        output = batch_scheduler.generate(inputs, cancel_token=cancel_token, max_new_tokens=max_new_tokens)
+    else:
+        inputs.update({
+            'tokenizer': tokenizer,
+            'max_new_tokens': max_new_tokens,
+            'decode_text': True,
+        })
+        if streamer is not None:
+            inputs['streamer'] = streamer
+        timer = GenerationTimer(inputs['input_ids'].shape[-1])
+        # Checked between decoding steps; on cancellation generate returns whatever was produced so far
+        inputs['stopping_criteria'] = StoppingCriteriaList([CancellationCriteria([cancel_token]), timer])
+        if use_prompt_lookup:
+            # Assisted generation only runs on a batch of one, so these requests skip the batch scheduler
+            inputs['prompt_lookup_num_tokens'] = PROMPT_LOOKUP_NUM_TOKENS
+            inputs['max_matching_ngram_size'] = PROMPT_LOOKUP_MAX_NGRAM
+        if use_prefix_cache:
+            prompt_ids = inputs['input_ids'][0]
+            inputs['past_key_values'] = prefix_cache.take(context_id, prompt_ids) or DynamicCache()
+        with torch.no_grad():
+            output = model.generate(**inputs)[0]
+        timer.observe()
+        if use_prefix_cache:
+            prefix_cache.store(context_id, prompt_ids, inputs['past_key_values'])
+    log.info("generate_done", chars=len(output or ""))
+    return output
+
+def summarize_history(previous_summary, lines):
+    """Fold older conversation lines into the rolling summary of a context."""
+    prompt = (
+        "Update the summary of this conversation with the new lines. "
+        "Keep names, places, units, times and open questions. Reply with the summary only.\n"
+        f"Current summary: {previous_summary or 'None'}\n"
+        "New lines:\n" + "\n".join(lines)
     )
-    inputs = inputs.to(DEVICE)
-    inputs.update({
-        'tokenizer': tokenizer,
-        'max_new_tokens': 500,
-        'decode_text': True,
-    })
-
-    print("Generating response...")
-    with torch.no_grad():
-        output = model.generate(**inputs)
-    print("Response generation complete.")
-    return output[0]
-
-def analyze(query=None, history = [], image_files=None, video_files=None, pdf_files=None):
-    try:
-        print("Analyzing the input query, images, videos, and PDFs...")
+    model, tokenizer, processor = model_manager.get()
+    return process_inputs_with_model(model, processor, tokenizer, prompt, max_new_tokens=HISTORY_SUMMARY_MAX_TOKENS)
 
+def analyze(query=None, history = [], image_files=None, video_files=None, pdf_files=None, streamer=None, context_id=None, summary=None, cancel_token=None, video_segment=None, pdf_pages=None, content_hashes=None):
+    """
+    Generate the bot's answer.
+    summary is the rolling history summary stored with the chat document; it is updated in place
+    when older turns get folded into it, so callers should persist it afterwards.
+    video_segment=(start, end) in seconds restricts the videos to that part (long-video mode).
+    pdf_pages=(first, last) restricts the PDFs to those pages.
+    content_hashes holds the SHA-256 of the files computed on upload (see process_inputs_with_model).
+    """
+    try:
         if isinstance(image_files, str):
             image_files = [image_files]
         if isinstance(video_files, str):
             video_files = [video_files]
         if isinstance(pdf_files, str):
             pdf_files = [pdf_files]
-        history = "\n".join(f"{h['sender']}: {h['message']}" for h in history)
+        model, tokenizer, processor = model_manager.get()
+        if summary is None:
+            summary = {}
+        history = history_builder.build(history, summary, tokenizer, summarize_history)
         query = f"{history}\n{query}" if query else history
         result = process_inputs_with_model(
             model,
@@ -190,8 +358,14 @@ def analyze(query=None, history = [], image_files=None, video_files=None, pdf_fi
             query if query else "Analyze the provided inputs",
             images=image_files,
             videos=video_files,
-            pdfs=pdf_files
+            pdfs=pdf_files,
+            streamer=streamer,
+            context_id=context_id,
+            cancel_token=cancel_token,
+            video_segment=video_segment,
+            pdf_pages=pdf_pages,
+            content_hashes=content_hashes
         )
         return result
     except Exception as e:
-        print(f"An error occurred: {e}")
\ No newline at end of file
+        log.error("analyze_failed", error=str(e))
\ No newline at end of file
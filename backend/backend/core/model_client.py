@@ -0,0 +1,144 @@
+import json
+import os
+import select
+import socket
+import struct
+import sys
+from fastapi import HTTPException
+
+# Add the project's top-level directory to sys.path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "../..")))
+from config_model import MODEL_SERVER_SOCKET, INFERENCE_TIMEOUT
+
+# analyze() arguments whose entries may be raw media bytes instead of filenames
+MEDIA_KEYS = ("image_files", "video_files", "pdf_files")
+
+# How often a waiting client checks whether its request was cancelled
+CANCEL_POLL_SECONDS = 0.5
+
+
+# Wire format: 4-byte big-endian header length, JSON header, then the raw buffers listed in header["buffers"]
+def send_message(sock, header: dict, buffers=()):
+    header = dict(header, buffers=[len(buffer) for buffer in buffers])
+    data = json.dumps(header, default=str).encode()
+    sock.sendall(struct.pack("!I", len(data)) + data)
+    for buffer in buffers:
+        sock.sendall(buffer)
+
+
+def _recv_exact(sock, size: int) -> bytearray:
+    data = bytearray(size)
+    view = memoryview(data)
+    received = 0
+    while received < size:
+        n = sock.recv_into(view[received:], size - received)
+        if n == 0:
+            raise ConnectionError("Model server connection closed")
+        received += n
+    return data
+
+
+def recv_message(sock):
+    size = struct.unpack("!I", _recv_exact(sock, 4))[0]
+    header = json.loads(_recv_exact(sock, size))
+    buffers = [_recv_exact(sock, n) for n in header.pop("buffers", [])]
+    return header, buffers
+
+
+def pack_media(kwargs: dict):
+    """Move bytes-like media out of the JSON arguments into raw buffers."""
+    buffers = []
+    packed = dict(kwargs)
+    for key in MEDIA_KEYS:
+        items = packed.get(key)
+        if not items or isinstance(items, str):
+            continue
+        packed[key] = []
+        for item in items:
+            if isinstance(item, (bytes, bytearray, memoryview)):
+                packed[key].append({"$buffer": len(buffers)})
+                buffers.append(item)
+            else:
+                packed[key].append(item)
+    return packed, buffers
+
+
+def unpack_media(kwargs: dict, buffers: list) -> dict:
+    """Inverse of pack_media on the server side."""
+    for key in MEDIA_KEYS:
+        items = kwargs.get(key)
+        if not items or isinstance(items, str):
+            continue
+        kwargs[key] = [buffers[item["$buffer"]] if isinstance(item, dict) else item for item in items]
+    return kwargs
+
+
+class ModelClient:
+    """
+    Talks to the standalone model server (core/model_server.py) over a Unix socket,
+    so several API workers can share a single loaded model.
+    """
+
+    def __init__(self, socket_path: str, timeout: float):
+        self.socket_path = socket_path
+        self.timeout = timeout
+
+    def _request(self, header: dict, buffers=(), on_token=None, cancel_token=None) -> dict:
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+            sock.settimeout(self.timeout)
+            try:
+                sock.connect(self.socket_path)
+            except OSError:
+                raise HTTPException(status_code=503, detail="Model server is not reachable")
+            send_message(sock, header, buffers)
+            while True:
+                # Closing the socket is how a cancellation reaches the server
+                while cancel_token is not None and not select.select([sock], [], [], CANCEL_POLL_SECONDS)[0]:
+                    if cancel_token.cancelled:
+                        return {"result": ""}
+                reply, _ = recv_message(sock)
+                if "token" in reply:
+                    if on_token:
+                        on_token(reply["token"])
+                    continue
+                if "error" in reply:
+                    raise HTTPException(status_code=reply.get("status", 500), detail=reply["error"])
+                return reply
+
+    def analyze(self, streamer=None, summary=None, cancel_token=None, **kwargs):
+        """Same contract as core.model.analyze, including the in-place summary update."""
+        packed, buffers = pack_media(kwargs)
+        header = {
+            "op": "stream" if streamer else "analyze",
+            "kwargs": dict(packed, summary=summary),
+            "deadline_seconds": cancel_token.remaining() if cancel_token else None,
+        }
+        try:
+            reply = self._request(
+                header,
+                buffers,
+                on_token=streamer.on_finalized_text if streamer else None,
+                cancel_token=cancel_token
+            )
+        finally:
+            if streamer:
+                streamer.on_finalized_text("", stream_end=True)
+        if summary is not None and reply.get("summary") is not None:
+            summary.clear()
+            summary.update(reply["summary"])
+        if cancel_token is not None and reply.get("reason"):
+            cancel_token.cancel(reply["reason"])
+        return reply.get("result")
+
+    def status(self) -> dict:
+        return self._request({"op": "status"})["result"]
+
+    def stats(self) -> dict:
+        return self._request({"op": "stats"})["result"]
+
+    def drop_context(self, context_id: str):
+        """Forget a deleted context's cached prompt prefix, which lives in the server process."""
+        self._request({"op": "drop_context", "context_id": context_id})
+
+
+model_client = ModelClient(socket_path=MODEL_SERVER_SOCKET, timeout=INFERENCE_TIMEOUT)
@@ -0,0 +1,194 @@
+import asyncio
+import os
+import sys
+import time
+import importlib.util
+import torch
+from fastapi import HTTPException
+from transformers import AutoTokenizer
+
+# Add the project's top-level directory to sys.path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "../..")))
+from config_model import BASE_DIR, COMPUTE_TYPE, MODE, BATCHING_ENABLED, INFERENCE_BACKEND, CPU_PROFILE_ENABLED, COMPILE_ENABLED
+from core.batching import batch_scheduler
+from core.vision_cache import vision_cache
+from core.model_client import model_client
+from core.cpu_profile import apply_cpu_profile, set_interop_threads
+from core.compilation import compile_model, warm_up_buckets
+from core.log import get_logger
+
+log = get_logger("model_manager")
+
+# Set the device based on configuration
+DEVICE = torch.device("cuda" if (COMPUTE_TYPE == "gpu" and torch.cuda.is_available()) else "cpu")
+
+# Counted from the first import of the serving stack, so readiness timings include imports
+PROCESS_START = time.perf_counter()
+
+# Function to dynamically load the model and tokenizer
+def load_model(model_dir):
+    sys.path.append(model_dir)
+
+    config_module_path = os.path.join(model_dir, "configuration_shakti.py")
+    model_module_path = os.path.join(model_dir, "modeling_shakti.py")
+
+    spec_config = importlib.util.spec_from_file_location("shaktiConfig", config_module_path)
+    if spec_config is None or spec_config.loader is None:
+        raise ImportError(f"Failed to load configuration module from {config_module_path}")
+    config_module = importlib.util.module_from_spec(spec_config)
+    sys.modules["shaktiConfig"] = config_module
+    spec_config.loader.exec_module(config_module)
+
+    spec_model = importlib.util.spec_from_file_location("shaktiModel", model_module_path)
+    if spec_model is None or spec_model.loader is None:
+        raise ImportError(f"Failed to load model module from {model_module_path}")
+    model_module = importlib.util.module_from_spec(spec_model)
+    sys.modules["shaktiModel"] = model_module
+    spec_model.loader.exec_module(model_module)
+
+    from shaktiConfig import shaktiConfig
+    from shaktiModel import shaktiModel
+
+    config = shaktiConfig.from_pretrained(model_dir)
+    # safetensors weights are memory-mapped and materialised tensor by tensor instead of via a full state dict copy;
+    # checkpoints that only ship pytorch_model*.bin still load the old way
+    has_safetensors = any(name.startswith("model.safetensors") for name in os.listdir(model_dir))
+    model = shaktiModel.from_pretrained(
+        model_dir,
+        config=config,
+        attn_implementation='sdpa',
+        torch_dtype=torch.float16 if DEVICE.type == "cuda" else torch.float32,
+        use_safetensors=has_safetensors,
+        low_cpu_mem_usage=True
+    )
+    model.eval().to(DEVICE)
+
+    tokenizer = AutoTokenizer.from_pretrained(model_dir)
+    processor = model.init_processor(tokenizer)
+
+    return model, tokenizer, processor
+
+
+class ModelManager:
+    """
+    Owns the Shakti model, tokenizer and processor. Loading and warm-up run in the
+    background at startup so the API can bind its port straight away and report
+    readiness through /health/ready.
+    With remote=True the model lives in the model server process instead and
+    this manager only relays its status.
+    """
+
+    def __init__(self, model_dir: str, mode: str, remote: bool = False, loader=load_model):
+        self.model_dir = model_dir
+        self.mode = mode
+        self.remote = remote
+        # Returns (model, tokenizer, processor) for model_dir; benchmarks swap in a stand-in model here
+        self.loader = loader
+        self.model = None
+        self.tokenizer = None
+        self.processor = None
+        self.ready = False
+        self.error = None
+        self.timings = {}
+        self.cpu_profile = None
+        self.compiled_buckets = None
+        self._task = None
+
+    async def start(self):
+        """Begin loading in a background thread; returns immediately."""
+        if self.remote:
+            return
+        if self._task is None:
+            self._task = asyncio.get_running_loop().run_in_executor(None, self.load)
+
+    def load(self):
+        """Load and warm up the model in the calling thread. Safe to call more than once."""
+        if self.ready:
+            return
+        try:
+            if self.mode == "model":
+                log.info("model_device", sampled=False, device=str(DEVICE), cuda=torch.version.cuda if DEVICE.type == "cuda" else None)
+                use_cpu_profile = CPU_PROFILE_ENABLED and DEVICE.type == "cpu"
+                if use_cpu_profile:
+                    set_interop_threads()
+                start = time.perf_counter()
+                self.model, self.tokenizer, self.processor = self.loader(self.model_dir)
+                self.timings["load_seconds"] = round(time.perf_counter() - start, 3)
+                log.info("model_loaded", sampled=False, seconds=self.timings["load_seconds"])
+                if use_cpu_profile:
+                    start = time.perf_counter()
+                    self.cpu_profile = apply_cpu_profile(self.model, self.tokenizer, self.processor)
+                    self.timings["cpu_profile_seconds"] = round(time.perf_counter() - start, 3)
+                if COMPILE_ENABLED:
+                    # After the CPU profile, so the quantized layers are what gets compiled
+                    start = time.perf_counter()
+                    compile_model(self.model)
+                    self.compiled_buckets = warm_up_buckets(self.model, self.tokenizer)
+                    self.timings["compile_seconds"] = round(time.perf_counter() - start, 3)
+                vision_cache.install(self.model)
+                if BATCHING_ENABLED:
+                    batch_scheduler.start(self.model, self.tokenizer)
+
+                start = time.perf_counter()
+                self.warm_up()
+                self.timings["warmup_seconds"] = round(time.perf_counter() - start, 3)
+            else:
+                log.info("running_without_model", sampled=False)
+            self.timings["ready_after_seconds"] = round(time.perf_counter() - PROCESS_START, 3)
+            self.ready = True
+            log.info("model_manager_ready", sampled=False, mode=self.mode, timings=self.timings)
+        except Exception as e:
+            self.error = str(e)
+            log.error("model_load_failed", error=str(e))
+
+    def warm_up(self):
+        """Run one short generate so kernels and allocator pools are initialised before real traffic."""
+        messages = [
+            {"role": "user", "content": "Hello"},
+            {"role": "assistant", "content": ""}
+        ]
+        inputs = self.processor(messages, images=None, videos=None).to(DEVICE)
+        inputs.update({
+            'tokenizer': self.tokenizer,
+            'max_new_tokens': 8,
+            'decode_text': True,
+        })
+        with torch.no_grad():
+            self.model.generate(**inputs)
+
+    def ensure_ready(self):
+        """Fail fast with 503 while the model is still loading (or failed to load)."""
+        # The model server answers 503 itself while it is loading
+        if self.remote:
+            return
+        if not self.ready:
+            detail = f"Model failed to load: {self.error}" if self.error else "Model is still loading"
+            raise HTTPException(status_code=503, detail=detail, headers={"Retry-After": "10"})
+
+    def get(self):
+        """Return (model, tokenizer, processor) once loaded."""
+        self.ensure_ready()
+        return self.model, self.tokenizer, self.processor
+
+    def status(self) -> dict:
+        if self.remote:
+            try:
+                return dict(model_client.status(), backend="server")
+            except HTTPException as e:
+                return {"ready": False, "mode": self.mode, "backend": "server", "error": e.detail, "timings": {}}
+        return {
+            "ready": self.ready,
+            "mode": self.mode,
+            "device": str(DEVICE),
+            "error": self.error,
+            "timings": self.timings,
+            "cpu_profile": self.cpu_profile,
+            "compiled_buckets": self.compiled_buckets,
+        }
+
+
+model_manager = ModelManager(
+    model_dir=os.path.join(BASE_DIR, "shakti-2B-041224"),
+    mode=MODE,
+    remote=INFERENCE_BACKEND == "server"
+)
@@ -0,0 +1,131 @@
+"""
+Standalone inference server owning the Shakti model, tokenizer and processor.
+API workers started with INFERENCE_BACKEND="server" forward analyze() calls here
+over a Unix socket, so any number of uvicorn workers share one model in memory.
+
+Run from backend/backend:
+    python -m core.model_server
+"""
+import os
+import select
+import socket
+import socketserver
+import sys
+import threading
+from fastapi import HTTPException
+from transformers import TextStreamer
+
+# Add the project's top-level directory to sys.path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "../..")))
+from config_model import MODEL_SERVER_SOCKET, INFERENCE_MAX_CONCURRENCY
+from core.model import analyze
+from core.model_manager import model_manager
+from core.model_client import send_message, recv_message, unpack_media
+from core.kv_cache import prefix_cache
+from core.vision_cache import vision_cache
+from core.frame_cache import frame_cache
+from core.pdf_extract import pdf_extractor
+from core.cancellation import CancellationToken
+from core.log import get_logger
+
+log = get_logger("model_server")
+
+# Bounds how many requests from all API workers prepare/generate at once
+slots = threading.BoundedSemaphore(INFERENCE_MAX_CONCURRENCY)
+
+
+class SocketStreamer(TextStreamer):
+    """Sends each decoded chunk back to the API worker as soon as it is produced."""
+
+    def __init__(self, tokenizer, sock):
+        super().__init__(tokenizer, skip_prompt=True, skip_special_tokens=True)
+        self.sock = sock
+
+    def on_finalized_text(self, text: str, stream_end: bool = False):
+        if text:
+            send_message(self.sock, {"token": text})
+
+
+def watch_disconnect(sock, cancel_token):
+    """The client sends nothing after its request, so a readable socket means it hung up."""
+    while not cancel_token.cancelled:
+        if select.select([sock], [], [], 0.5)[0]:
+            try:
+                closed = sock.recv(1, socket.MSG_PEEK) == b""
+            except OSError:
+                closed = True
+            if closed:
+                cancel_token.cancel("disconnected")
+            return
+
+
+class ModelRequestHandler(socketserver.BaseRequestHandler):
+    def handle(self):
+        sock = self.request
+        try:
+            header, buffers = recv_message(sock)
+            op = header.get("op")
+            if op == "status":
+                send_message(sock, {"result": model_manager.status()})
+                return
+            if op == "stats":
+                send_message(sock, {"result": {
+                    "prefix_cache": prefix_cache.stats(),
+                    "vision_cache": vision_cache.stats(),
+                    "frame_cache": frame_cache.stats(),
+                    "pdf_cache": pdf_extractor.stats(),
+                }})
+                return
+            if op == "drop_context":
+                prefix_cache.drop(header["context_id"])
+                send_message(sock, {"result": None})
+                return
+
+            model_manager.ensure_ready()
+            kwargs = unpack_media(header.get("kwargs", {}), buffers)
+            summary = kwargs.get("summary")
+            if op == "stream":
+                kwargs["streamer"] = SocketStreamer(model_manager.tokenizer, sock)
+            elif op != "analyze":
+                raise HTTPException(status_code=400, detail=f"Unknown operation: {op}")
+            cancel_token = CancellationToken(header.get("deadline_seconds"))
+            kwargs["cancel_token"] = cancel_token
+            watcher = threading.Thread(target=watch_disconnect, args=(sock, cancel_token), daemon=True)
+            watcher.start()
+            try:
+                with slots:
+                    result = analyze(**kwargs)
+            finally:
+                if not cancel_token.cancelled:
+                    # Stops the watcher; the reply below is still sent normally
+                    cancel_token.cancel(None)
+            send_message(sock, {"result": result, "summary": summary, "reason": cancel_token.reason})
+        except HTTPException as e:
+            send_message(sock, {"error": e.detail, "status": e.status_code})
+        except ConnectionError:
+            log.warning("api_worker_disconnected")
+        except Exception as e:
+            send_message(sock, {"error": str(e), "status": 500})
+
+
+class ModelServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+
+def main():
+    # This process is the one that actually holds the model
+    model_manager.remote = False
+    if os.path.exists(MODEL_SERVER_SOCKET):
+        os.remove(MODEL_SERVER_SOCKET)
+    with ModelServer(MODEL_SERVER_SOCKET, ModelRequestHandler) as server:
+        # Answer status requests while the model is still loading
+        threading.Thread(target=model_manager.load, name="model-loader", daemon=True).start()
+        log.info("model_server_listening", sampled=False, socket=MODEL_SERVER_SOCKET)
+        try:
+            server.serve_forever()
+        finally:
+            os.remove(MODEL_SERVER_SOCKET)
+
+
+if __name__ == "__main__":
+    main()
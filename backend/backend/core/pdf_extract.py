@@ -0,0 +1,254 @@
+import hashlib
+import io
+import json
+import multiprocessing
+import os
+import shutil
+import sys
+import threading
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import fitz  # PyMuPDF
+from PIL import Image
+
+# Add the project's top-level directory to sys.path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "../..")))
+from config_model import (
+    PDF_EXTRACT_PROCESSES, PDF_PAGES_PER_TASK, PDF_MAX_PAGES, PDF_CACHE_DIR, PDF_CACHE_MAX_BYTES,
+    INGEST_MODEL_MAX_SIDE
+)
+
+# This module is imported by the pool's worker processes, so it must not pull in torch or the model.
+
+
+def parse_page_range(value):
+    """'3-10', '7' or [3, 10] (1-based, inclusive) as (first, last); None or '' as None. Raises ValueError."""
+    if value in (None, ""):
+        return None
+    if isinstance(value, str):
+        value = value.replace(" ", "").split("-")
+    bounds = [int(v) for v in value]
+    if len(bounds) == 1:
+        bounds *= 2
+    if len(bounds) != 2 or bounds[0] < 1 or bounds[1] < bounds[0]:
+        raise ValueError(f"Invalid page range: {value}")
+    return bounds[0], bounds[1]
+
+
+def check_page_range(pages, total: int):
+    """Raises ValueError when a (first, last) range starts past the end of a total-page document."""
+    if pages and pages[0] > total:
+        raise ValueError(f"Page {pages[0]} is past the end of this {total}-page document")
+
+
+def write_atomic(path: str, write):
+    tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp_path, "wb") as f:
+        write(f)
+    os.replace(tmp_path, path)
+
+
+def decode_image(data: bytes, max_side: int) -> np.ndarray:
+    """Embedded image as RGB uint8, no larger than model resolution (scanned pages are often huge)."""
+    img = Image.open(io.BytesIO(data))
+    img.draft("RGB", (max_side, max_side))
+    img = img.convert("RGB")
+    if max(img.size) > max_side:
+        img.thumbnail((max_side, max_side), Image.LANCZOS)
+    return np.asarray(img)
+
+
+def extract_pages(path: str, doc_dir: str, page_numbers: list, max_side: int) -> int:
+    """
+    Write the text and images of the given 0-based pages into doc_dir: <page>.json holds the text and
+    the xrefs of the page's images, x<xref>.npy each image once, however many pages show it.
+    Runs in a pool process, or in-process for small jobs.
+    """
+    with fitz.open(path) as document:
+        for page_number in page_numbers:
+            page = document[page_number]
+            xrefs = []
+            for img in page.get_images(full=True):
+                xref = img[0]
+                image_path = os.path.join(doc_dir, f"x{xref}.npy")
+                if not os.path.exists(image_path):
+                    pixels = decode_image(document.extract_image(xref)["image"], max_side)
+                    write_atomic(image_path, lambda f: np.save(f, pixels))
+                xrefs.append(xref)
+            record = json.dumps({"text": page.get_text(), "images": xrefs}).encode()
+            write_atomic(os.path.join(doc_dir, f"{page_number}.json"), lambda f: f.write(record))
+    return len(page_numbers)
+
+
+class PdfExtractor:
+    """
+    Text and images of PDF pages, extracted once per document (keyed by its SHA-256) and page into
+    cache_dir, so a PDF referenced again costs a few file reads. Pages still missing are split into
+    tasks of pages_per_task and extracted in parallel worker processes. At most max_pages pages are
+    read per request; the cache is kept under max_bytes by removing the least recently used documents.
+    """
+
+    def __init__(self, cache_dir: str, max_bytes: int, processes: int, pages_per_task: int, max_pages: int, max_side: int):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.processes = processes
+        self.pages_per_task = pages_per_task
+        self.max_pages = max_pages
+        self.max_side = max_side
+        self._pool = None
+        self._lock = threading.Lock()
+        # Document directories with an extraction in flight, which eviction leaves alone
+        self._in_use = {}
+        self.counters = {"page_hits": 0, "page_misses": 0, "truncated_documents": 0}
+
+    def _get_pool(self) -> ProcessPoolExecutor:
+        with self._lock:
+            if self._pool is None:
+                # Forking a process that holds the model and its threads is unsafe; spawn fresh workers
+                self._pool = ProcessPoolExecutor(max_workers=self.processes, mp_context=multiprocessing.get_context("spawn"))
+            return self._pool
+
+    def shutdown(self):
+        with self._lock:
+            if self._pool is not None:
+                self._pool.shutdown(cancel_futures=True)
+                self._pool = None
+
+    def _page_count(self, doc_dir: str, pdf) -> int:
+        meta_path = os.path.join(doc_dir, "meta.json")
+        try:
+            with open(meta_path) as f:
+                return json.load(f)["pages"]
+        except (FileNotFoundError, ValueError):
+            pass
+        document = fitz.open(stream=bytes(pdf), filetype="pdf") if isinstance(pdf, (bytes, bytearray, memoryview)) else fitz.open(pdf)
+        with document:
+            pages = len(document)
+        record = json.dumps({"pages": pages}).encode()
+        write_atomic(meta_path, lambda f: f.write(record))
+        return pages
+
+    def _extract_missing(self, pdf, doc_dir: str, missing: list):
+        source = pdf
+        if isinstance(pdf, (bytes, bytearray, memoryview)):
+            # Workers read the document from disk rather than each receiving a pickled copy
+            source = os.path.join(doc_dir, f"source.{os.getpid()}.{threading.get_ident()}.pdf")
+            with open(source, "wb") as f:
+                f.write(pdf)
+        try:
+            tasks = [missing[i:i + self.pages_per_task] for i in range(0, len(missing), self.pages_per_task)]
+            if len(tasks) == 1:
+                extract_pages(source, doc_dir, tasks[0], self.max_side)
+                return
+            pool = self._get_pool()
+            futures = [pool.submit(extract_pages, source, doc_dir, task, self.max_side) for task in tasks]
+            for future in futures:
+                future.result()
+        finally:
+            if source is not pdf:
+                os.remove(source)
+
+    def _doc_dir(self, pdf, doc_hash: str = None) -> str:
+        if isinstance(pdf, (bytes, bytearray, memoryview)):
+            doc_hash = doc_hash or hashlib.sha256(pdf).hexdigest()
+        elif doc_hash is None:
+            digest = hashlib.sha256()
+            with open(pdf, "rb") as f:
+                for chunk in iter(lambda: f.read(1024 * 1024), b""):
+                    digest.update(chunk)
+            doc_hash = digest.hexdigest()
+        return os.path.join(self.cache_dir, doc_hash)
+
+    def page_count(self, pdf, doc_hash: str = None) -> int:
+        """Number of pages of a PDF given as a path or its bytes, cached with its extracted pages."""
+        doc_dir = self._doc_dir(pdf, doc_hash)
+        os.makedirs(doc_dir, exist_ok=True)
+        return self._page_count(doc_dir, pdf)
+
+    def extract(self, pdf, doc_hash: str = None, pages=None):
+        """
+        (images, text) of a PDF given as a path or its bytes; pages is a 1-based inclusive (first, last).
+        doc_hash skips hashing the file when the caller already knows it.
+        Raises ValueError when pages starts past the end of the document.
+        """
+        doc_dir = self._doc_dir(pdf, doc_hash)
+        with self._lock:
+            self._in_use[doc_dir] = self._in_use.get(doc_dir, 0) + 1
+        try:
+            try:
+                return self._extract(pdf, doc_dir, pages)
+            except FileNotFoundError:
+                # Another process sharing the cache evicted (part of) the document meanwhile; extract it again
+                return self._extract(pdf, doc_dir, pages, refresh=True)
+        finally:
+            with self._lock:
+                self._in_use[doc_dir] -= 1
+                if not self._in_use[doc_dir]:
+                    del self._in_use[doc_dir]
+
+    def _extract(self, pdf, doc_dir: str, pages, refresh: bool = False):
+        os.makedirs(doc_dir, exist_ok=True)
+        total = self._page_count(doc_dir, pdf)
+        check_page_range(pages, total)
+        first, last = pages or (1, total)
+        last = min(last, total)
+        last_read = min(last, first + self.max_pages - 1)
+        wanted = list(range(first - 1, last_read))
+        missing = wanted if refresh else [n for n in wanted if not os.path.exists(os.path.join(doc_dir, f"{n}.json"))]
+        self.counters["page_hits"] += len(wanted) - len(missing)
+        self.counters["page_misses"] += len(missing)
+        if missing:
+            self._extract_missing(pdf, doc_dir, missing)
+
+        texts = []
+        images = []
+        for page_number in wanted:
+            with open(os.path.join(doc_dir, f"{page_number}.json")) as f:
+                record = json.load(f)
+            texts.append(record["text"])
+            images += [Image.fromarray(np.load(os.path.join(doc_dir, f"x{xref}.npy"))) for xref in record["images"]]
+        if last_read < last:
+            self.counters["truncated_documents"] += 1
+            texts.append(f"\n[Only pages {first}-{last_read} of this {total}-page document were read.]\n")
+        # The directory's modification time is the LRU order
+        os.utime(doc_dir)
+        if missing:
+            self._evict(keep=doc_dir)
+        return images, "".join(texts)
+
+    def _evict(self, keep: str):
+        documents = []
+        total = 0
+        for name in os.listdir(self.cache_dir):
+            doc_dir = os.path.join(self.cache_dir, name)
+            try:
+                size = sum(entry.stat().st_size for entry in os.scandir(doc_dir))
+                documents.append((os.path.getmtime(doc_dir), doc_dir, size))
+            except (FileNotFoundError, NotADirectoryError):
+                continue
+            total += size
+        for _, doc_dir, size in sorted(documents):
+            if total <= self.max_bytes:
+                break
+            with self._lock:
+                in_use = doc_dir in self._in_use
+            if doc_dir != keep and not in_use:
+                shutil.rmtree(doc_dir, ignore_errors=True)
+                total -= size
+
+    def stats(self) -> dict:
+        lookups = self.counters["page_hits"] + self.counters["page_misses"]
+        return {
+            **self.counters,
+            "page_hit_rate": self.counters["page_hits"] / lookups if lookups else 0.0,
+        }
+
+
+pdf_extractor = PdfExtractor(
+    cache_dir=PDF_CACHE_DIR,
+    max_bytes=PDF_CACHE_MAX_BYTES,
+    processes=PDF_EXTRACT_PROCESSES,
+    pages_per_task=PDF_PAGES_PER_TASK,
+    max_pages=PDF_MAX_PAGES,
+    max_side=INGEST_MODEL_MAX_SIDE
+)
@@ -0,0 +1,92 @@
+import asyncio
+import base64
+import os
+import shutil
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+# Add the project's top-level directory to sys.path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "../..")))
+from config_model import STORAGE_IO_THREADS, STORAGE_MAX_CONCURRENT_WRITES
+from core.metrics import STAGE_SECONDS
+
+
+class AsyncStorage:
+    """
+    Runs blocking upload work (base64 decode, image encode, file writes, directory setup) on a
+    bounded thread pool so the event loop keeps serving other requests during large uploads.
+    Writes additionally pass a semaphore capping how many hit the disk at once.
+    Each operation's latency is recorded as a stage in the latency histogram and summarised by stats().
+    """
+
+    def __init__(self, io_threads: int, max_concurrent_writes: int):
+        self.max_concurrent_writes = max_concurrent_writes
+        self._pool = ThreadPoolExecutor(max_workers=io_threads, thread_name_prefix="storage")
+        self._write_slots = None
+        self._waiting_writes = 0
+        self._latency = {}
+
+    def _observe(self, op: str, seconds: float):
+        STAGE_SECONDS.labels(stage=op).observe(seconds)
+        count, total, worst = self._latency.get(op, (0, 0.0, 0.0))
+        self._latency[op] = (count + 1, total + seconds, max(worst, seconds))
+
+    async def run(self, op: str, fn, *args):
+        """Run fn(*args) on the storage pool and record its latency under op."""
+        start = time.perf_counter()
+        try:
+            return await asyncio.get_running_loop().run_in_executor(self._pool, fn, *args)
+        finally:
+            self._observe(op, time.perf_counter() - start)
+
+    async def write(self, op: str, fn, *args):
+        """Like run(), for work that writes to disk; waits for a write slot first."""
+        if self._write_slots is None:
+            self._write_slots = asyncio.Semaphore(self.max_concurrent_writes)
+        self._waiting_writes += 1
+        try:
+            await self._write_slots.acquire()
+        finally:
+            self._waiting_writes -= 1
+        try:
+            return await self.run(op, fn, *args)
+        finally:
+            self._write_slots.release()
+
+    async def b64decode(self, data) -> bytes:
+        return await self.run("base64_decode", base64.b64decode, data)
+
+    async def makedirs(self, path):
+        await self.run("disk_makedirs", lambda: os.makedirs(path, exist_ok=True))
+
+    async def write_bytes(self, path, data: bytes):
+        def write():
+            with open(path, "wb") as f:
+                f.write(data)
+        await self.write("disk_write", write)
+
+    async def concat(self, sources: list, destination):
+        """Concatenate files into destination, streaming instead of reading each source whole."""
+        def concat():
+            with open(destination, "wb") as out:
+                for source in sources:
+                    with open(source, "rb") as f:
+                        shutil.copyfileobj(f, out, 1024 * 1024)
+        await self.write("chunk_combine", concat)
+
+    async def remove_tree(self, path):
+        await self.run("disk_remove", shutil.rmtree, path, True)
+
+    def stats(self) -> dict:
+        return {
+            "max_concurrent_writes": self.max_concurrent_writes,
+            "waiting_writes": self._waiting_writes,
+            "latency_seconds": {
+                op: {"count": count, "mean": round(total / count, 4), "max": round(worst, 4)}
+                for op, (count, total, worst) in self._latency.items()
+            },
+        }
+
+
+storage = AsyncStorage(io_threads=STORAGE_IO_THREADS, max_concurrent_writes=STORAGE_MAX_CONCURRENT_WRITES)
@@ -0,0 +1,49 @@
+import asyncio
+from transformers import TextStreamer
+
+
+class AsyncTextStreamer(TextStreamer):
+    """
+    Generation streamer that forwards decoded text from the inference thread
+    to an asyncio queue, so a route can yield tokens as they are produced.
+    """
+
+    def __init__(self, tokenizer, loop: asyncio.AbstractEventLoop, **decode_kwargs):
+        super().__init__(tokenizer, skip_prompt=True, skip_special_tokens=True, **decode_kwargs)
+        self.loop = loop
+        self.queue = asyncio.Queue()
+
+    def on_finalized_text(self, text: str, stream_end: bool = False):
+        if text:
+            self.loop.call_soon_threadsafe(self.queue.put_nowait, text)
+        if stream_end:
+            self.loop.call_soon_threadsafe(self.queue.put_nowait, None)
+
+
+async def iterate_streamer(streamer: AsyncTextStreamer, job: asyncio.Future, timeout: float):
+    """
+    Yield text chunks from the streamer until generation ends.
+    Stops as well when the generation job finishes without closing the stream (e.g. it raised).
+    """
+    deadline = asyncio.get_running_loop().time() + timeout
+    while True:
+        getter = asyncio.ensure_future(streamer.queue.get())
+        remaining = deadline - asyncio.get_running_loop().time()
+        done, _ = await asyncio.wait({getter, job}, timeout=max(remaining, 0), return_when=asyncio.FIRST_COMPLETED)
+        if getter in done:
+            text = getter.result()
+            if text is None:
+                return
+            yield text
+            continue
+
+        getter.cancel()
+        if not done:
+            raise asyncio.TimeoutError()
+        # The job is finished; flush whatever it queued before returning
+        while not streamer.queue.empty():
+            text = streamer.queue.get_nowait()
+            if text is None:
+                return
+            yield text
+        return
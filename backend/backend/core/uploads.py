@@ -0,0 +1,194 @@
+import hashlib
+import os
+import sys
+import tempfile
+from fastapi import HTTPException, Request
+
+try:
+    from python_multipart.multipart import MultipartParser, parse_options_header
+except ImportError:
+    # python-multipart before 0.0.13
+    from multipart.multipart import MultipartParser, parse_options_header
+
+# Add the project's top-level directory to sys.path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "../..")))
+from core.storage import storage
+from config_model import (
+    UPLOAD_MAX_IMAGE_BYTES, UPLOAD_MAX_VIDEO_BYTES, UPLOAD_MAX_PDF_BYTES, UPLOAD_MAX_FILES,
+    UPLOAD_MAX_REQUEST_BYTES, UPLOAD_SPOOL_BYTES, UPLOAD_FLUSH_BYTES
+)
+
+# Largest accepted file per media kind; the kinds are also the multipart field names
+UPLOAD_LIMITS = {
+    "images": UPLOAD_MAX_IMAGE_BYTES,
+    "videos": UPLOAD_MAX_VIDEO_BYTES,
+    "pdfs": UPLOAD_MAX_PDF_BYTES,
+}
+# Plain form fields such as the message are small; anything bigger is rejected
+MAX_FIELD_BYTES = 1024 ** 2
+
+
+def check_upload_size(kind: str, size: int):
+    if size > UPLOAD_LIMITS[kind]:
+        raise HTTPException(
+            status_code=413,
+            detail=f"{kind[:-1].capitalize()} exceeds the {UPLOAD_LIMITS[kind] // 1024 ** 2} MB limit"
+        )
+
+
+class UploadPart:
+    """
+    One file of a multipart chat upload. Videos stream into a temp file inside directory so they
+    can be renamed into place; images and PDFs go to a spooled file that stays in memory while small.
+    The SHA-256 is computed as the bytes arrive, so a streamed video never has to be read back to be named.
+    """
+
+    def __init__(self, kind: str, filename: str = "", directory: str = None):
+        self.kind = kind
+        self.filename = filename
+        self.digest = hashlib.sha256()
+        self.size = 0
+        self._pending = []
+        self._pending_bytes = 0
+        if directory:
+            self.file = tempfile.NamedTemporaryFile(dir=directory, suffix=".part", delete=False)
+            self.path = self.file.name
+        else:
+            self.file = tempfile.SpooledTemporaryFile(max_size=UPLOAD_SPOOL_BYTES)
+            self.path = None
+
+    def append(self, data: bytes):
+        """Buffer received bytes; the size limit is checked before anything is kept."""
+        self.size += len(data)
+        check_upload_size(self.kind, self.size)
+        data = bytes(data)
+        self.digest.update(data)
+        self._pending.append(data)
+        self._pending_bytes += len(data)
+
+    @property
+    def sha256(self) -> str:
+        return self.digest.hexdigest()
+
+    @property
+    def extension(self):
+        """Lower-case extension of the client's filename, if it sent a usable one."""
+        extension = os.path.splitext(self.filename)[1].lstrip(".").lower()
+        return extension if extension.isalnum() and len(extension) <= 8 else None
+
+    @property
+    def needs_flush(self) -> bool:
+        return self._pending_bytes >= UPLOAD_FLUSH_BYTES
+
+    def flush(self):
+        if self._pending:
+            self.file.write(b"".join(self._pending))
+            self._pending = []
+            self._pending_bytes = 0
+
+    def finish(self):
+        """Write what is left and close a streamed video so it can be moved."""
+        self.flush()
+        if self.path:
+            self.file.close()
+
+    def read(self) -> bytes:
+        self.file.seek(0)
+        data = self.file.read()
+        self.file.close()
+        return data
+
+    def discard(self):
+        self.file.close()
+        if self.path and os.path.exists(self.path):
+            os.remove(self.path)
+
+
+async def parse_chat_upload(request: Request, video_dir: str):
+    """
+    Parse a multipart/form-data chat message as it arrives: plain fields (message, cache) and
+    file parts named images, videos or pdfs. Memory stays bounded by UPLOAD_FLUSH_BYTES per file
+    plus the spooled images/PDFs, and size limits fail the request with 413 as soon as they are crossed.
+    Returns (fields, parts) where parts maps each media kind to its UploadParts.
+    """
+    content_type, params = parse_options_header(request.headers.get("content-type", ""))
+    if content_type != b"multipart/form-data" or b"boundary" not in params:
+        raise HTTPException(status_code=400, detail="Expected a multipart/form-data body")
+    declared = request.headers.get("content-length")
+    if declared and declared.isdigit() and int(declared) > UPLOAD_MAX_REQUEST_BYTES:
+        raise HTTPException(status_code=413, detail="Upload is too large")
+
+    fields = {}
+    parts = {kind: [] for kind in UPLOAD_LIMITS}
+    state = {"headers": {}, "header_field": b"", "header_value": b"", "name": None, "part": None, "value": None}
+
+    def on_part_begin():
+        state.update(headers={}, name=None, part=None, value=None)
+
+    def on_header_field(data, start, end):
+        state["header_field"] += data[start:end]
+
+    def on_header_value(data, start, end):
+        state["header_value"] += data[start:end]
+
+    def on_header_end():
+        state["headers"][state["header_field"].lower()] = state["header_value"]
+        state.update(header_field=b"", header_value=b"")
+
+    def on_headers_finished():
+        _, options = parse_options_header(state["headers"].get(b"content-disposition", b""))
+        name = options.get(b"name", b"").decode("latin-1")
+        state["name"] = name
+        if b"filename" not in options:
+            state["value"] = bytearray()
+            return
+        if name not in parts:
+            raise HTTPException(status_code=400, detail=f"Unexpected file field: {name}")
+        if sum(len(files) for files in parts.values()) >= UPLOAD_MAX_FILES:
+            raise HTTPException(status_code=413, detail=f"At most {UPLOAD_MAX_FILES} files per message")
+        filename = options[b"filename"].decode("utf-8", errors="replace")
+        state["part"] = UploadPart(name, filename, directory=video_dir if name == "videos" else None)
+        parts[name].append(state["part"])
+
+    def on_part_data(data, start, end):
+        if state["part"] is not None:
+            state["part"].append(data[start:end])
+            return
+        state["value"] += data[start:end]
+        if len(state["value"]) > MAX_FIELD_BYTES:
+            raise HTTPException(status_code=413, detail=f"Form field {state['name']} is too large")
+
+    def on_part_end():
+        if state["part"] is None and state["value"] is not None:
+            fields[state["name"]] = state["value"].decode("utf-8")
+
+    parser = MultipartParser(params[b"boundary"], {
+        "on_part_begin": on_part_begin,
+        "on_header_field": on_header_field,
+        "on_header_value": on_header_value,
+        "on_header_end": on_header_end,
+        "on_headers_finished": on_headers_finished,
+        "on_part_data": on_part_data,
+        "on_part_end": on_part_end,
+    })
+    received = 0
+    try:
+        async for chunk in request.stream():
+            received += len(chunk)
+            if received > UPLOAD_MAX_REQUEST_BYTES:
+                raise HTTPException(status_code=413, detail="Upload is too large")
+            parser.write(chunk)
+            for files in parts.values():
+                for part in files:
+                    if part.needs_flush:
+                        await storage.write("upload_flush", part.flush)
+        parser.finalize()
+        for files in parts.values():
+            for part in files:
+                await storage.write("upload_flush", part.finish)
+    except Exception:
+        for files in parts.values():
+            for part in files:
+                part.discard()
+        raise
+    return fields, parts
@@ -0,0 +1,173 @@
+import hashlib
+import os
+import sys
+import threading
+from collections import OrderedDict
+import numpy as np
+import torch
+
+# Add the project's top-level directory to sys.path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "../..")))
+from config_model import VISION_CACHE_MAX_BYTES, VISION_CACHE_MAX_IMAGES, VISION_CACHE_DIR, VISION_CACHE_DISK_MAX_BYTES
+from core.log import get_logger
+
+log = get_logger("vision_cache")
+
+# Attribute carrying the content key of the images behind a pixel_values tensor
+MEDIA_KEY_ATTR = "_shakti_media_key"
+
+
+def sha256_bytes(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+
+def sha256_file(path: str, chunk_size: int = 1024 * 1024) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def tag_media(pixel_values: torch.Tensor, image_hashes: list):
+    """Mark a pixel_values tensor with the content key of the images it was built from."""
+    setattr(pixel_values, MEDIA_KEY_ATTR, sha256_bytes("|".join(image_hashes).encode()))
+
+
+class VisionFeatureCache:
+    """
+    Content-addressed cache for uploaded images, keyed by the SHA-256 of their bytes.
+    Decoded RGB images live in a small in-memory LRU; vision-encoder outputs live in an
+    in-memory LRU bounded by bytes, backed by an optional tier of memory-mapped .npy files.
+    """
+
+    def __init__(self, max_bytes: int, max_images: int, disk_dir: str = None, disk_max_bytes: int = 0):
+        self.max_bytes = max_bytes
+        self.max_images = max_images
+        self.disk_dir = disk_dir
+        self.disk_max_bytes = disk_max_bytes
+        self._images = OrderedDict()
+        self._features = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.counters = {
+            "image_hits": 0,
+            "image_misses": 0,
+            "feature_hits": 0,
+            "feature_disk_hits": 0,
+            "feature_misses": 0,
+        }
+        if disk_dir:
+            os.makedirs(disk_dir, exist_ok=True)
+
+    # Decoded images
+    def get_image(self, key: str):
+        with self._lock:
+            image = self._images.get(key)
+            if image is None:
+                self.counters["image_misses"] += 1
+                return None
+            self._images.move_to_end(key)
+            self.counters["image_hits"] += 1
+            return image
+
+    def put_image(self, key: str, image):
+        with self._lock:
+            self._images[key] = image
+            self._images.move_to_end(key)
+            while len(self._images) > self.max_images:
+                self._images.popitem(last=False)
+
+    # Vision-encoder outputs
+    def _disk_path(self, key: str) -> str:
+        return os.path.join(self.disk_dir, f"{key}.npy")
+
+    def get_features(self, key: str):
+        with self._lock:
+            features = self._features.get(key)
+            if features is not None:
+                self._features.move_to_end(key)
+                self.counters["feature_hits"] += 1
+                return features
+        if self.disk_dir and os.path.exists(self._disk_path(key)):
+            features = torch.from_numpy(np.load(self._disk_path(key), mmap_mode="r"))
+            os.utime(self._disk_path(key))
+            self.counters["feature_disk_hits"] += 1
+            return features
+        self.counters["feature_misses"] += 1
+        return None
+
+    def put_features(self, key: str, features: torch.Tensor):
+        features = features.detach().cpu()
+        nbytes = features.numel() * features.element_size()
+        if nbytes <= self.max_bytes:
+            with self._lock:
+                old = self._features.pop(key, None)
+                if old is not None:
+                    self._bytes -= old.numel() * old.element_size()
+                self._features[key] = features
+                self._bytes += nbytes
+                while self._bytes > self.max_bytes:
+                    _, evicted = self._features.popitem(last=False)
+                    self._bytes -= evicted.numel() * evicted.element_size()
+        if self.disk_dir:
+            self._write_disk(key, features)
+
+    def _write_disk(self, key: str, features: torch.Tensor):
+        # numpy has no bfloat16, so those features are widened for storage
+        if features.dtype == torch.bfloat16:
+            features = features.float()
+        tmp_path = self._disk_path(key) + ".tmp"
+        with open(tmp_path, "wb") as f:
+            np.save(f, features.numpy())
+        os.replace(tmp_path, self._disk_path(key))
+
+        files = [os.path.join(self.disk_dir, name) for name in os.listdir(self.disk_dir) if name.endswith(".npy")]
+        total = sum(os.path.getsize(path) for path in files)
+        for path in sorted(files, key=os.path.getmtime):
+            if total <= self.disk_max_bytes:
+                break
+            total -= os.path.getsize(path)
+            os.remove(path)
+
+    def install(self, model):
+        """Route the model's vision encoder through the cache for tagged pixel_values."""
+        if not hasattr(model, "forward_image"):
+            log.warning("vision_cache_disabled", reason="model has no forward_image()")
+            return
+        encode = model.forward_image
+
+        def cached_forward_image(pixel_values, *args, **kwargs):
+            key = getattr(pixel_values, MEDIA_KEY_ATTR, None) if pixel_values is not None else None
+            if key is None:
+                return encode(pixel_values, *args, **kwargs)
+            features = self.get_features(key)
+            if features is not None:
+                return features.to(device=pixel_values.device, dtype=model.dtype)
+            features = encode(pixel_values, *args, **kwargs)
+            if torch.is_tensor(features):
+                self.put_features(key, features)
+            return features
+
+        model.forward_image = cached_forward_image
+
+    def stats(self) -> dict:
+        image_lookups = self.counters["image_hits"] + self.counters["image_misses"]
+        feature_hits = self.counters["feature_hits"] + self.counters["feature_disk_hits"]
+        feature_lookups = feature_hits + self.counters["feature_misses"]
+        return {
+            **self.counters,
+            "images": len(self._images),
+            "features": len(self._features),
+            "feature_bytes": self._bytes,
+            "image_hit_rate": self.counters["image_hits"] / image_lookups if image_lookups else 0.0,
+            "feature_hit_rate": feature_hits / feature_lookups if feature_lookups else 0.0,
+        }
+
+
+vision_cache = VisionFeatureCache(
+    max_bytes=VISION_CACHE_MAX_BYTES,
+    max_images=VISION_CACHE_MAX_IMAGES,
+    disk_dir=VISION_CACHE_DIR,
+    disk_max_bytes=VISION_CACHE_DISK_MAX_BYTES
+)
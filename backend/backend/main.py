@@ -1,17 +1,22 @@
 import os
 from fastapi import FastAPI, HTTPException
-from fastapi.responses import JSONResponse
-from fastapi.staticfiles import StaticFiles
+from fastapi.responses import JSONResponse, Response
+from prometheus_client import generate_latest, CONTENT_TYPE_LATEST
 from core.config import settings
 from api.routers.upload import router as upload_router
 from api.routers.chat import router as chat_router
 from api.routers.train import router as train_router
 from api.routers.login import router as login_router
 from api.routers.user import router as user_router
+from api.routers.inference import router as inference_router
 from fastapi.middleware.cors import CORSMiddleware
 from pathlib import Path
 # from core.middleware import JWTAuthenticationMiddleware
-from redisDB.database import initialize_services, redis_cache
+from redisDB.database import initialize_services, close_services, redis_cache
+from core.inference import inference_executor
+from core.model_manager import model_manager
+from core.media_store import media_store, MediaFiles
+from core.pdf_extract import pdf_extractor
 app = FastAPI(debug=settings.debug)
 
 app.add_middleware(
@@ -25,19 +30,44 @@ app.add_middleware(
 os.makedirs(Path("images"), exist_ok=True)
 os.makedirs(Path("videos"), exist_ok=True)
 os.makedirs(Path("pdfs"), exist_ok=True)
-app.mount("/images", StaticFiles(directory="images"), name="images")
-app.mount("/videos", StaticFiles(directory="videos"), name="videos")
-app.mount("/pdfs", StaticFiles(directory="pdfs"), name="pdfs")
+media_store.start()
+# Content-addressed names are served from the media store, older timestamp names from these folders
+app.mount("/images", MediaFiles(media_store, "images", directory="images"), name="images")
+app.mount("/videos", MediaFiles(media_store, "videos", directory="videos"), name="videos")
+app.mount("/pdfs", MediaFiles(media_store, "pdfs", directory="pdfs"), name="pdfs")
+# /thumbnails/<stored image name> serves the small JPEG generated when the image was uploaded
+app.mount("/thumbnails", MediaFiles(media_store, "images", derived="thumb.jpg", directory=media_store.derived_dir), name="thumbnails")
 app.include_router(upload_router, prefix="/api/upload", tags=["Upload"])
 app.include_router(train_router, prefix="/api/train", tags=["Training"])  # Example for the training route
 app.include_router(chat_router, prefix="/api/chat", tags=["Chat"])  # Example for the chat route
 app.include_router(login_router, prefix="/api/auth", tags=["Auth"])  # Example for the authentication route
 app.include_router(user_router, prefix="/api/user", tags=["User"])  # Example for the user route
+app.include_router(inference_router, prefix="/api/inference", tags=["Inference"])
 
 @app.on_event("startup")
 async def startup_event():
     await initialize_services()
+    await inference_executor.start()
+    # The model loads in the background; /health/ready reports when it can serve
+    await model_manager.start()
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    await inference_executor.stop()
+    pdf_extractor.shutdown()
+    await close_services()
 # Root route
 @app.get("/")
 def read_root():
     return {"msg": "Welcome to the API"}
+
+# Readiness probe: true once the model is loaded and warmed up
+@app.get("/health/ready")
+def read_ready():
+    status = model_manager.status()
+    return JSONResponse(status, status_code=200 if status["ready"] else 503)
+
+# Prometheus scrape endpoint: per-stage latency, tokens, queue wait and cache hit counters
+@app.get("/metrics")
+def read_metrics():
+    return Response(generate_latest(), media_type=CONTENT_TYPE_LATEST)
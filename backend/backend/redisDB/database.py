@@ -1,5 +1,10 @@
 import asyncio
+import hashlib
+import os
+import sys
+import time
 from redis.asyncio import Redis
+from redis.exceptions import RedisError
 from bson import ObjectId
 from datetime import datetime, timezone
 from pymongo import ReturnDocument
@@ -7,38 +12,47 @@ from pydantic import BaseModel
 import json
 from core.database import db  
 from fastapi import HTTPException
+# Add the project's top-level directory to sys.path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "../..")))
+from config_model import ANSWER_CACHE_TTL, ANSWER_CACHE_MAX_ENTRIES, ANSWER_CACHE_MAX_ANSWER_BYTES, MODEL_VERSION
+from core.metrics import timed, ANSWER_CACHE_LOOKUPS
+from core.log import get_logger
+
+log = get_logger("redis")
 # Redis Connection Manager
 class RedisCache:
     """Redis caching and synchronization utility."""
     
     def __init__(self, redis_url: str):
         self.client = Redis.from_url(redis_url, decode_responses=True)
-        print("Redis client initialized.")
+        log.info("redis_client_initialized", sampled=False)
     
     async def connect(self):
         """Connect to Redis and subscribe to key expiration events."""
         await self.client.config_set("notify-keyspace-events", "Ex")
-        print("Connected to Redis!")
+        log.info("redis_connected", sampled=False)
     
     async def close(self):
         """Close the Redis connection."""
         await self.client.close()
-        print("Disconnected from Redis!")
+        log.info("redis_disconnected", sampled=False)
 
     async def get(self, context_id: str, user_id: str):
         """
         Retrieve chats from Redis for the given context and user ID.
         If not found, fetch from MongoDB, populate Redis, and return the data.
         """
-        print("Getting chats from Redis...")
         redis_key = f"{context_id}:user:{user_id}"
-        chats_json = await self.client.get(redis_key)
+        with timed("redis_get"):
+            chats_json = await self.client.get(redis_key)
+        log.info("chats_get", context_id=context_id, cached=chats_json is not None)
 
         if chats_json:
             return json.loads(chats_json)
-        chat_document = await db.chats_collection.find_one(
-            {"context_id": ObjectId(context_id), "user_id": ObjectId(user_id)}
-        )
+        with timed("mongo_find"):
+            chat_document = await db.chats_collection.find_one(
+                {"context_id": ObjectId(context_id), "user_id": ObjectId(user_id)}
+            )
         if not chat_document:
             return None
 
@@ -54,9 +68,10 @@ class RedisCache:
         await self.client.set(redis_key, json.dumps(chat_document), ex=3600)
         return chat_document
 
-    async def update(self, context_id: str, user_id: str, new_chats: list[dict]):    
+    async def update(self, context_id: str, user_id: str, new_chats: list[dict], summary: dict = None):
         """
         Update chats in Redis and MongoDB for the given context and user ID.
+        When given, the rolling history summary is stored alongside the chats.
         """
         redis_key = f"{context_id}:user:{user_id}"
         chat_document = await self.get(context_id, user_id)  # Fetch current data
@@ -68,20 +83,26 @@ class RedisCache:
         for message in new_chats:
             message["timestamp"] = datetime.now(timezone.utc).isoformat()
         chat_document["chats"].extend(new_chats)
+        update = {"chats": chat_document["chats"]}
+        if summary:
+            chat_document["summary"] = summary
+            update["summary"] = summary
 
         # Update Redis
-        await self.client.set(redis_key, json.dumps(chat_document), ex=3600)
+        with timed("redis_set"):
+            await self.client.set(redis_key, json.dumps(chat_document), ex=3600)
 
         # Update MongoDB
         try:
-            await db.chats_collection.find_one_and_update(
-                {"context_id": ObjectId(context_id), "user_id": ObjectId(user_id)},
-                {"$set": {"chats": chat_document["chats"]}},
-                return_document=ReturnDocument.AFTER,
-                upsert=True
-            )
+            with timed("mongo_update"):
+                await db.chats_collection.find_one_and_update(
+                    {"context_id": ObjectId(context_id), "user_id": ObjectId(user_id)},
+                    {"$set": update},
+                    return_document=ReturnDocument.AFTER,
+                    upsert=True
+                )
         except Exception as e:
-            print(f"Error updating MongoDB: {e}")
+            log.error("mongo_update_failed", context_id=context_id, error=str(e))
 
 
         
@@ -94,8 +115,92 @@ class RedisCache:
         return chat_document
 
 
+class AnswerCache:
+    """
+    Finished answers of analyze() keyed by the normalized query, the SHA-256 of each attached
+    file, a digest of the conversation history and the model version. Re-asking the same
+    question about the same files, in any context or by any user, skips generation.
+    Shares the connection of RedisCache; a Redis failure only turns into a cache miss.
+    """
+
+    KEY_PREFIX = "answer:"
+    INDEX_KEY = "answer_cache:index"  # Sorted set of answer keys by insertion time, used for eviction
+    HITS_KEY = "answer_cache:hits"
+    MISSES_KEY = "answer_cache:misses"
+
+    def __init__(self, cache: RedisCache, ttl: int, max_entries: int, max_answer_bytes: int, model_version: str):
+        self.cache = cache
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.max_answer_bytes = max_answer_bytes
+        self.model_version = model_version
+
+    def make_key(self, query: str, media_hashes: dict, history: list = None, summary: dict = None) -> str:
+        history_lines = [[message.get("sender"), message.get("message")] for message in history or []]
+        payload = {
+            "query": " ".join((query or "").lower().split()),
+            "media": media_hashes,
+            "history": hashlib.sha256(json.dumps([history_lines, (summary or {}).get("text")]).encode()).hexdigest(),
+            "model": self.model_version,
+        }
+        return self.KEY_PREFIX + hashlib.sha256(json.dumps(payload, sort_keys=True).encode()).hexdigest()
+
+    async def get(self, key: str):
+        client = self.cache.client
+        try:
+            answer = await client.get(key)
+            await client.incr(self.HITS_KEY if answer is not None else self.MISSES_KEY)
+            ANSWER_CACHE_LOOKUPS.labels(result="hit" if answer is not None else "miss").inc()
+            return answer
+        except RedisError as e:
+            log.warning("answer_cache_lookup_failed", error=str(e))
+            return None
+
+    async def set(self, key: str, answer: str):
+        if not answer or len(answer.encode()) > self.max_answer_bytes:
+            return
+        client = self.cache.client
+        now = time.time()
+        try:
+            async with client.pipeline(transaction=False) as pipe:
+                pipe.set(key, answer, ex=self.ttl)
+                pipe.zadd(self.INDEX_KEY, {key: now})
+                # Answers past their TTL are already gone from Redis
+                pipe.zremrangebyscore(self.INDEX_KEY, 0, now - self.ttl)
+                pipe.zcard(self.INDEX_KEY)
+                size = (await pipe.execute())[-1]
+            if size > self.max_entries:
+                evicted = await client.zpopmin(self.INDEX_KEY, size - self.max_entries)
+                await client.delete(*[evicted_key for evicted_key, _ in evicted])
+        except RedisError as e:
+            log.warning("answer_cache_store_failed", error=str(e))
+
+    async def stats(self) -> dict:
+        client = self.cache.client
+        try:
+            hits, misses = await client.mget(self.HITS_KEY, self.MISSES_KEY)
+            entries = await client.zcard(self.INDEX_KEY)
+        except RedisError as e:
+            return {"error": str(e)}
+        hits, misses = int(hits or 0), int(misses or 0)
+        return {
+            "entries": entries,
+            "max_entries": self.max_entries,
+            "hits": hits,
+            "misses": misses,
+            "hit_rate": round(hits / (hits + misses), 3) if hits + misses else 0.0,
+        }
+
+
 # Initialize Redis
 redis_cache = RedisCache(redis_url="redis://localhost:6379")
+answer_cache = AnswerCache(
+    redis_cache,
+    ttl=ANSWER_CACHE_TTL,
+    max_entries=ANSWER_CACHE_MAX_ENTRIES,
+    max_answer_bytes=ANSWER_CACHE_MAX_ANSWER_BYTES,
+    model_version=MODEL_VERSION
+)
 
 # Example usage in your application
 async def initialize_services():
@@ -0,0 +1,5 @@
+import os
+import sys
+
+# Tests import the app's modules the way main.py does, from backend/backend
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
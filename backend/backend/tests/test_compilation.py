@@ -0,0 +1,53 @@
+import pytest
+
+torch = pytest.importorskip("torch")
+pytest.importorskip("transformers")
+pytest.importorskip("prometheus_client")
+
+from config_model import COMPILE_PROMPT_BUCKETS
+from core.compilation import bucket_length, pad_to_bucket, pad_to_length
+
+BUCKETS = sorted(COMPILE_PROMPT_BUCKETS)
+
+
+def text_inputs(length):
+    ids = torch.arange(1, length + 1).unsqueeze(0)
+    return {"input_ids": ids, "attention_mask": torch.ones_like(ids)}
+
+
+def test_bucket_length_picks_smallest_fitting_bucket():
+    assert bucket_length(1) == BUCKETS[0]
+    assert bucket_length(BUCKETS[0]) == BUCKETS[0]
+    assert bucket_length(BUCKETS[0] + 1) == BUCKETS[1]
+    assert bucket_length(BUCKETS[-1]) == BUCKETS[-1]
+
+
+def test_bucket_length_keeps_prompts_beyond_largest_bucket():
+    assert bucket_length(BUCKETS[-1] + 1) == BUCKETS[-1] + 1
+
+
+def test_pad_to_bucket_left_pads_ids_and_mask():
+    inputs = pad_to_bucket(text_inputs(5), pad_token_id=0)
+    assert inputs["input_ids"].shape == (1, BUCKETS[0])
+    assert inputs["input_ids"][0, -5:].tolist() == [1, 2, 3, 4, 5]
+    assert inputs["input_ids"][0, :-5].eq(0).all()
+    assert inputs["attention_mask"][0, :-5].eq(0).all()
+    assert inputs["attention_mask"][0, -5:].eq(1).all()
+
+
+def test_pad_to_bucket_leaves_full_and_oversized_prompts():
+    for length in (BUCKETS[0], BUCKETS[-1] + 3):
+        assert pad_to_bucket(text_inputs(length), pad_token_id=0)["input_ids"].shape[-1] == length
+
+
+def test_pad_to_bucket_keeps_media_prompts_unpadded():
+    inputs = text_inputs(5)
+    inputs["pixel_values"] = [[torch.zeros(3, 4, 4)]]
+    assert pad_to_bucket(inputs, pad_token_id=0)["input_ids"].shape[-1] == 5
+
+
+@pytest.mark.parametrize("bucket", BUCKETS)
+def test_pad_to_length_reaches_every_bucket(bucket):
+    inputs = pad_to_length(text_inputs(2), bucket, pad_token_id=7)
+    assert inputs["input_ids"].shape == (1, bucket)
+    assert inputs["attention_mask"].sum() == 2
@@ -4,4 +4,126 @@ BASE_DIR = os.path.dirname(os.path.abspath(__file__))  # Project root folder
 DATA_PATH = os.path.join(BASE_DIR, 'data')  # Example data folder
 MODEL_PATH = os.path.join(BASE_DIR, 'shakti-2B-041224')  # Example models folder
 COMPUTE_TYPE = "gpu" # "gpu" or "cpu"
-MODE="model"  # "model" or "notmodel"
\ No newline at end of file
+MODE="model"  # "model" or "notmodel"
+
+# Inference executor
+INFERENCE_MAX_CONCURRENCY = 4  # Number of requests being prepared/generated at once (lets the batcher fill batches)
+INFERENCE_MAX_QUEUE = 8  # Requests allowed to wait for a free slot before we answer 503
+INFERENCE_TIMEOUT = 300  # Seconds a request may spend queued + generating
+
+# Dynamic batching of model.generate across concurrent chats
+BATCHING_ENABLED = True
+BATCH_MAX_SIZE = 4  # Most requests merged into one generate call
+BATCH_WAIT_MS = 25  # How long the first request waits for others to join its batch
+
+# Per-context KV cache reuse across conversation turns
+PREFIX_CACHE_ENABLED = True
+PREFIX_CACHE_MAX_BYTES = 2 * 1024 ** 3  # Memory budget for cached key/values across all contexts
+
+# Conversation history sent with each prompt
+HISTORY_TOKEN_BUDGET = 2048  # Tokens of summary + recent turns prepended to a query
+HISTORY_SUMMARY_MAX_TOKENS = 200  # Length of the rolling summary of older turns
+
+# Cache of decoded images and vision-encoder outputs keyed by image content hash
+VISION_CACHE_MAX_BYTES = 512 * 1024 ** 2  # In-memory budget for encoder outputs
+VISION_CACHE_MAX_IMAGES = 64  # Decoded images kept in memory
+VISION_CACHE_DIR = None  # e.g. os.path.join(BASE_DIR, "cache", "vision") to keep encoder outputs on disk
+VISION_CACHE_DISK_MAX_BYTES = 4 * 1024 ** 3
+
+# Where inference runs: "local" loads the model in every API worker, "server" forwards
+# to one shared model server process (python -m core.model_server)
+INFERENCE_BACKEND = "local"  # "local" or "server"
+MODEL_SERVER_SOCKET = "/tmp/shakti-model.sock"
+
+# CPU serving profile, applied when COMPUTE_TYPE="cpu" (or no GPU is available)
+CPU_PROFILE_ENABLED = True
+CPU_QUANTIZE_INT8 = True  # Dynamic int8 quantization of the language model's linear layers
+CPU_BF16_AUTOCAST = False  # Only helps on CPUs with native bf16 (AVX512-BF16/AMX)
+CPU_THREAD_CANDIDATES = None  # e.g. [8, 16, 32]; None tries all, half and a quarter of the cores
+CPU_INTEROP_THREADS = 1
+
+# Per-request generation limits
+REQUEST_DEADLINE_SECONDS = 240  # Generation stops here and the partial answer is kept; keep below INFERENCE_TIMEOUT
+DISCONNECT_POLL_SECONDS = 1.0  # How often chat routes check whether the client went away
+
+# Prompt-lookup speculative decoding for answers about uploaded PDFs: draft tokens are copied
+# from matching n-grams in the prompt and verified in a single forward pass
+PROMPT_LOOKUP_ENABLED = True
+PROMPT_LOOKUP_NUM_TOKENS = 10  # Tokens drafted per lookup
+PROMPT_LOOKUP_MAX_NGRAM = 2  # Longest n-gram matched against the prompt
+
+# Redis cache of finished answers keyed by query, media content hashes, history and model version
+ANSWER_CACHE_ENABLED = True  # Requests can still opt out with "cache": false
+ANSWER_CACHE_TTL = 24 * 3600  # Seconds an answer is served from the cache
+ANSWER_CACHE_MAX_ENTRIES = 10000  # Oldest answers are evicted beyond this
+ANSWER_CACHE_MAX_ANSWER_BYTES = 64 * 1024  # Longer answers are not cached
+MODEL_VERSION = "shakti-2B-041224"  # Bump after fine-tuning or swapping adapters so cached answers are not reused
+
+# Opt-in torch.compile of the language model forward. Text prompts are left-padded up to the
+# next bucket length so only these prefill shapes get compiled, each warmed up at startup
+COMPILE_ENABLED = False
+COMPILE_MODE = "default"  # torch.compile mode, e.g. "max-autotune" for longer compiles and faster kernels
+COMPILE_PROMPT_BUCKETS = [128, 256, 512, 1024, 2048]  # Longer prompts run at their own length
+COMPILE_WARMUP_NEW_TOKENS = 4  # Decode steps per bucket during warm-up
+
+# Structured logging of the inference path
+LOG_LEVEL = "INFO"
+LOG_SAMPLE_RATE = 0.1  # Share of routine info events written; warnings and errors are always logged
+
+# Chat media uploads; limits apply to the base64 JSON routes and the multipart routes alike
+UPLOAD_MAX_IMAGE_BYTES = 20 * 1024 ** 2
+UPLOAD_MAX_VIDEO_BYTES = 1024 ** 3
+UPLOAD_MAX_PDF_BYTES = 100 * 1024 ** 2
+UPLOAD_MAX_FILES = 16  # Files per message
+UPLOAD_MAX_REQUEST_BYTES = 2 * 1024 ** 3  # Whole multipart body
+UPLOAD_SPOOL_BYTES = 1024 ** 2  # Multipart images and PDFs move from memory to a temp file beyond this
+UPLOAD_FLUSH_BYTES = 1024 ** 2  # Received bytes buffered before they are written out on a worker thread
+
+# Content-addressed media store: uploads are kept once per SHA-256 in their original encoding
+MEDIA_STORE_DIR = os.path.join(BASE_DIR, "backend", "media")
+
+# Storage I/O for uploads: decode, encode and file writes run on this pool instead of the event loop
+STORAGE_IO_THREADS = 8
+STORAGE_MAX_CONCURRENT_WRITES = 4  # Large writes beyond this wait instead of saturating the disk
+
+# Ingest-time image derivatives, generated in the background next to each stored image
+INGEST_ENABLED = True
+INGEST_THUMBNAIL_SIZE = 256  # Longest side of the display thumbnail served under /thumbnails
+INGEST_MODEL_MAX_SIDE = 1152  # Longest side of the model-ready RGB array; the processor tiles images into at most 3x3 crops of 384 px
+
+# Video frame sampling: only the sampled frames are decoded, already resized, on several threads
+VIDEO_DECODE_THREADS = 4
+VIDEO_FRAME_SHORT_SIDE = 384  # Frames are decoded with their shorter side scaled down to this (never up)
+VIDEO_SNAP_TO_KEYFRAMES = True  # Sample the nearest keyframe when it is within half the spacing between samples
+
+# Sampled video frames kept on disk per video and sampling settings, so follow-up questions skip decoding
+FRAME_CACHE_DIR = os.path.join(BASE_DIR, "cache", "frames")  # None disables the cache
+FRAME_CACHE_MAX_BYTES = 8 * 1024 ** 3
+
+# Long-video mode: a single clip at least this long is analysed per time segment, then the findings are merged
+LONG_VIDEO_ENABLED = True
+LONG_VIDEO_MIN_SECONDS = 600
+LONG_VIDEO_SEGMENT_SECONDS = 300  # Each segment gets the usual frame budget
+LONG_VIDEO_MAX_SEGMENTS = 24  # Longer clips get longer segments instead of more of them
+# Segments of one request generating at once. Each runs on its own inference worker (video prompts skip
+# the batch scheduler), so values above INFERENCE_MAX_CONCURRENCY add nothing. The workers share one model,
+# so this overlaps frame decoding, preprocessing and the device's spare capacity rather than dividing the
+# run time by the value.
+LONG_VIDEO_MAX_PARALLEL = INFERENCE_MAX_CONCURRENCY
+LONG_VIDEO_DEADLINE_SECONDS = 1800  # Replaces REQUEST_DEADLINE_SECONDS for the whole map-reduce run
+
+# Near-duplicate filtering of video frames and PDF images before the vision encoder
+VISION_DEDUP_ENABLED = True
+VISION_DEDUP_MAX_DISTANCE = 6  # Differing bits (of 64) under which two difference hashes count as the same picture
+# Frames sampled per frame of budget, so duplicates can be dropped without leaving the budget unused.
+# Decode cost grows with it: 2 decodes up to twice the frames for clips longer than MAX_NUM_FRAMES seconds
+# (shorter clips are sampled at one frame per second either way). 1 samples only the budget.
+VIDEO_CANDIDATE_FACTOR = 2
+VISION_TOKENS_PER_IMAGE = 729  # Encoder tokens per image or frame (27x27 patches at 384 px), for reporting savings
+
+# PDF extraction: pages fan out over worker processes and are cached per document and page
+PDF_EXTRACT_PROCESSES = 4
+PDF_PAGES_PER_TASK = 8  # Pages handed to one worker at a time; documents needing no more are read in-process
+PDF_MAX_PAGES = 100  # Pages read per document and request; the rest is skipped with a note in the prompt
+PDF_CACHE_DIR = os.path.join(BASE_DIR, "cache", "pdf")
+PDF_CACHE_MAX_BYTES = 4 * 1024 ** 3